@@ -0,0 +1,46 @@
+"""
+sampling benchmark: numpy native samplers vs scipy 'rvs'
+latency per call at preview sizes, throughput at data set sizes
+
+usage: PYTHONPATH=src/ python3 benchmark_noise.py
+"""
+
+from timeit import repeat
+
+import numpy as np
+
+from models.noise import Distribution
+
+SMALL_SIZES = [100, 1_000]
+LARGE_SIZES = [1_000_000]
+
+
+def best_time(distribution: Distribution, size: int, native: bool) -> float:
+    rng = np.random.default_rng(0)
+    number = max(1, 10_000 // size)
+    times = repeat(
+        lambda: distribution.sample(rng, size, native=native), number=number, repeat=5
+    )
+    return min(times) / number
+
+
+if __name__ == "__main__":
+    print(f"{'distribution':<12}{'n':>10}{'scipy':>14}{'native':>14}{'speedup':>10}")
+    for name in Distribution.parameter_options():
+        distribution = Distribution.get_distribution("0", name)
+        assert distribution is not None
+        for size in SMALL_SIZES + LARGE_SIZES:
+            scipy_time = best_time(distribution, size, native=False)
+            native_time = best_time(distribution, size, native=True)
+            if size in SMALL_SIZES:
+                # latency per call
+                scipy_col = f"{scipy_time * 1e6:.1f} us"
+                native_col = f"{native_time * 1e6:.1f} us"
+            else:
+                # throughput
+                scipy_col = f"{size / scipy_time / 1e6:.1f} M/s"
+                native_col = f"{size / native_time / 1e6:.1f} M/s"
+            print(
+                f"{name:<12}{size:>10}{scipy_col:>14}{native_col:>14}"
+                f"{scipy_time / native_time:>9.1f}x"
+            )
@@ -128,6 +128,58 @@ def setup_callbacks():
 
         return MechanismBuilder().children
 
+    @callback(
+        Output({"type": "class-assignment-choice", "index": MATCH}, "value"),
+        Input({"type": "class-assignment-choice", "index": MATCH}, "value"),
+        State({"type": "class-assignment-choice", "index": MATCH}, "id"),
+        prevent_initial_call=True,
+    )
+    def change_class_assignment(
+        choice: Literal["strict", "first_match"], id_: dict[str, str]
+    ):
+        if choice not in ["strict", "first_match"]:
+            raise PreventUpdate("Invalid choice")
+
+        node_id = id_.get("index", None)
+        if node_id is None:
+            raise PreventUpdate("Node not found")
+
+        LOGGER.info(f"Invoked 'change_class_assignment' for node with id: {node_id}")
+
+        node = graph.get_node_by_id(node_id)
+        if node is None:
+            LOGGER.error(f"Failed to find node with id: {node_id}")
+            raise PreventUpdate("Node not found")
+
+        node.mechanism_metadata.class_assignment = choice
+        return choice
+
+    @callback(
+        Output({"type": "mechanism-backend-choice", "index": MATCH}, "value"),
+        Input({"type": "mechanism-backend-choice", "index": MATCH}, "value"),
+        State({"type": "mechanism-backend-choice", "index": MATCH}, "id"),
+        prevent_initial_call=True,
+    )
+    def change_mechanism_backend(
+        choice: Literal["numpy", "threaded"], id_: dict[str, str]
+    ):
+        if choice not in ["numpy", "threaded"]:
+            raise PreventUpdate("Invalid choice")
+
+        node_id = id_.get("index", None)
+        if node_id is None:
+            raise PreventUpdate("Node not found")
+
+        LOGGER.info(f"Invoked 'change_mechanism_backend' for node with id: {node_id}")
+
+        node = graph.get_node_by_id(node_id)
+        if node is None:
+            LOGGER.error(f"Failed to find node with id: {node_id}")
+            raise PreventUpdate("Node not found")
+
+        node.mechanism_metadata.backend = choice
+        return choice
+
     # TODO: new button for confirmation -> left and right
     def confirm_mechanism():
         raise PreventUpdate()
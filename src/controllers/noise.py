@@ -4,6 +4,7 @@ from dash import ALL, MATCH, Input, Output, State, callback, ctx
 from dash.exceptions import PreventUpdate
 
 from models.graph import graph
+from models.noise import PREVIEW_CACHE, SAMPLING_MODES
 from utils.logger import DashLogger
 from views.noise import NoiseBuilder, NoiseContainer, NoiseNodeBuilder, NoiseViewer
 
@@ -34,6 +35,10 @@ def setup_callbacks():
             )
             raise PreventUpdate
 
+        if choice == "empirical" and distr.source is None:
+            # nothing to sample yet, the source is loaded with its own button
+            return NoiseNodeBuilder((node_id, distr_id), choice).children
+
         try:
             distr.change_distribution(choice)
         except Exception as e:
@@ -44,6 +49,45 @@ def setup_callbacks():
 
         return NoiseNodeBuilder((node_id, distr_id)).children
 
+    @callback(
+        Output(
+            {"type": "noise-node-builder", "index": MATCH},
+            "children",
+            allow_duplicate=True,
+        ),
+        Input({"type": "load-empirical", "index": MATCH}, "n_clicks"),
+        State({"type": "empirical-source", "index": MATCH}, "value"),
+        State({"type": "load-empirical", "index": MATCH}, "id"),
+        prevent_initial_call=True,
+    )
+    def load_empirical_distribution(_, source: str | None, id_: dict[str, str]):
+        node_id, distr_id = id_.get("index", "").split("_")
+
+        LOGGER.info(f"Invoked 'load_empirical_distribution' for: {node_id}_{distr_id}")
+
+        if not source:
+            raise PreventUpdate("No source")
+
+        node = graph.get_node_by_id(node_id)
+        if node is None:
+            LOGGER.error(f"Failed to find node with id: {node_id}")
+            raise PreventUpdate
+
+        distr = node.noise.get_distribution_by_id(distr_id)
+        if distr is None:
+            LOGGER.error(
+                f"Failed to find distr with id: {distr_id} for node with id: {node_id}"
+            )
+            raise PreventUpdate
+
+        try:
+            distr.change_distribution("empirical", source=source)
+        except Exception as e:
+            LOGGER.exception(f"Failed to load empirical distribution from: {source}")
+            raise PreventUpdate from e
+
+        return NoiseNodeBuilder((node_id, distr_id)).children
+
     @callback(
         Output({"type": "slider", "index": MATCH}, "min"),
         Output({"type": "slider", "index": MATCH}, "value"),
@@ -137,6 +181,60 @@ def setup_callbacks():
         prevent_initial_call=True,
     )
     def update_graph_on_slider_release(*_):
+        children = NoiseViewer().children
+        LOGGER.debug(f"noise preview cache: {PREVIEW_CACHE.stats()}")
+        return children
+
+    @callback(
+        Output("noise-viewer", "children", allow_duplicate=True),
+        Input({"type": "noise-sampling-choice", "index": ALL}, "value"),
+        prevent_initial_call=True,
+    )
+    def change_noise_sampling(_):
+        triggered_node: dict | None = ctx.triggered_id
+        if triggered_node is None:
+            raise PreventUpdate
+
+        node_id = triggered_node.get("index", None)
+        choice = ctx.triggered[0].get("value", None)
+        if node_id is None or choice not in ["fresh", "common"]:
+            raise PreventUpdate("Invalid choice")
+
+        LOGGER.info(f"Invoked 'change_noise_sampling' for node with id: {node_id}")
+
+        node = graph.get_node_by_id(node_id)
+        if node is None:
+            LOGGER.error(f"Failed to find node with id: {node_id}")
+            raise PreventUpdate("Node not found")
+
+        node.noise.common_random_numbers = choice == "common"
+        NoiseViewer.SELECTED_NODE_ID = node_id
+        return NoiseViewer().children
+
+    @callback(
+        Output("noise-viewer", "children", allow_duplicate=True),
+        Input({"type": "noise-sampling-mode", "index": ALL}, "value"),
+        prevent_initial_call=True,
+    )
+    def change_noise_sampling_mode(_):
+        triggered_node: dict | None = ctx.triggered_id
+        if triggered_node is None:
+            raise PreventUpdate
+
+        node_id = triggered_node.get("index", None)
+        choice = ctx.triggered[0].get("value", None)
+        if node_id is None or choice not in SAMPLING_MODES:
+            raise PreventUpdate("Invalid choice")
+
+        LOGGER.info(f"Invoked 'change_noise_sampling_mode' for node with id: {node_id}")
+
+        node = graph.get_node_by_id(node_id)
+        if node is None:
+            LOGGER.error(f"Failed to find node with id: {node_id}")
+            raise PreventUpdate("Node not found")
+
+        node.noise.sampling = choice
+        NoiseViewer.SELECTED_NODE_ID = node_id
         return NoiseViewer().children
 
     @callback(
@@ -217,3 +315,15 @@ def setup_callbacks():
             raise PreventUpdate(f"Invalid node choice: {node_id}")
         NoiseViewer.SELECTED_NODE_ID = node_id
         return NoiseViewer().children
+
+    @callback(
+        Output("noise-viewer", "children", allow_duplicate=True),
+        Input("noise-viewer-mode", "value"),
+        prevent_initial_call=True,
+    )
+    def change_noise_viewer_mode(mode: str):
+        LOGGER.info(f"Changing noise viewer mode to: {mode}")
+        if mode not in NoiseViewer.PREVIEW_MODES:
+            raise PreventUpdate(f"Invalid preview mode: {mode}")
+        NoiseViewer.PREVIEW_MODE = mode
+        return NoiseViewer().children
@@ -1,18 +1,25 @@
-import string
-from copy import deepcopy
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
+from typing import Any
 
 import numpy as np
 import pandas as pd
+from numpy.typing import DTypeLike
 
+from models.graph_index import GraphIndex
 from models.mechanism import (
+    FUSED_CHUNK_SIZE,
     ClassificationMechanism,
+    FusedNode,
     MechanismMetadata,
     MechanismState,
     MechanismType,
     RegressionMechanism,
+    compile_fused_kernel,
+    get_backend,
 )
-from models.noise import Noise
+from models.noise import CONSTANTS, Noise, SamplingMode, stream_seed
 
 
 @dataclass
@@ -23,6 +30,9 @@ class Node:
 
     in_nodes: list["Node"] = field(default_factory=list)
     out_nodes: list["Node"] = field(default_factory=list)
+    # ids of the lists above for O(1) membership
+    _in_node_ids: set[str] = field(default_factory=set, init=False, repr=False)
+    _out_node_ids: set[str] = field(default_factory=set, init=False, repr=False)
     noise: Noise = field(init=False)
     data: np.ndarray | None = None
     mechanism_metadata: MechanismMetadata = field(init=False)
@@ -30,6 +40,14 @@ class Node:
     def __post_init__(self) -> None:
         self.noise = Noise.default_noise(self.id_)
         self.mechanism_metadata = MechanismMetadata(var_name=self.id_)
+        self._in_node_ids = set(self.get_in_node_ids())
+        self._out_node_ids = set(self.get_out_node_ids())
+
+    def has_in_node(self, id_: str) -> bool:
+        return id_ in self._in_node_ids
+
+    def has_out_node(self, id_: str) -> bool:
+        return id_ in self._out_node_ids
 
     def get_in_node_ids(self) -> list[str]:
         return [n.id_ for n in self.in_nodes]
@@ -42,36 +60,40 @@ class Node:
         Exception:
             target node already an in node
         """
-        if to_add in self.in_nodes:
+        if to_add.id_ in self._in_node_ids:
             raise Exception("Node already an in_node")
         self.in_nodes.append(to_add)
+        self._in_node_ids.add(to_add.id_)
 
     def add_out_node(self, to_add: "Node") -> None:
         """
         Exception:
             target node already an out node
         """
-        if to_add in self.out_nodes:
+        if to_add.id_ in self._out_node_ids:
             raise Exception("Node already an out_node")
         self.out_nodes.append(to_add)
+        self._out_node_ids.add(to_add.id_)
 
     def remove_in_node(self, to_remove: "Node") -> None:
         """
         Exception:
             target node not an in node
         """
-        if to_remove.id_ not in self.get_in_node_ids():
+        if to_remove.id_ not in self._in_node_ids:
             raise Exception("Target node is not an in node")
-        self.in_nodes.remove(to_remove)
+        self.in_nodes = [n for n in self.in_nodes if n.id_ != to_remove.id_]
+        self._in_node_ids.remove(to_remove.id_)
 
     def remove_out_node(self, to_remove: "Node") -> None:
         """
         Exception:
             target node not an out node
         """
-        if to_remove.id_ not in self.get_out_node_ids():
+        if to_remove.id_ not in self._out_node_ids:
             raise Exception("Target node is not an out node")
-        self.out_nodes.remove(to_remove)
+        self.out_nodes = [n for n in self.out_nodes if n.id_ != to_remove.id_]
+        self._out_node_ids.remove(to_remove.id_)
 
     def change_type(self, new_type: MechanismType) -> None:
         assert self.mechanism_metadata.state == "editable"
@@ -90,7 +112,9 @@ class Node:
             case "regression":
                 mechanism = RegressionMechanism(formulas, data)
             case "classification":
-                mechanism = ClassificationMechanism(formulas, data)
+                mechanism = ClassificationMechanism(
+                    formulas, data, self.mechanism_metadata.class_assignment
+                )
         # we do not care about the data, only if the data generation failed
         return mechanism.transform().error is None
 
@@ -108,18 +132,54 @@ class Node:
         self.mechanism_metadata.state = new_state
 
 
+@dataclass
+class NodeTiming:
+    """seconds since the start of the run, 'noise' is part of start -> end"""
+
+    start: float
+    end: float
+    noise: float = 0.0
+
+
+@dataclass
+class GenerationReport:
+    """statistics of the last 'generate_full_data_set' run"""
+
+    # inputs that had to be converted before evaluating a mechanism
+    bytes_copied: int = 0
+    # per node, empty for a fused run
+    node_timings: dict[str, NodeTiming] = field(default_factory=dict)
+    wall_time: float = 0.0
+    max_workers: int = 1
+
+
 @dataclass
 class Graph:
-    nodes: dict[str, Node | None] = field(
-        default_factory=lambda: {str(id): None for id in string.ascii_lowercase}
-    )
+    # existing nodes by id, 'index' holds their integer handles and edges
+    nodes: dict[str, Node] = field(default_factory=dict)
     data: None = None
+    last_generation: GenerationReport = field(default_factory=GenerationReport)
+    # root seed, every node draws its noise from an own stream spawned from it
+    seed: int = field(default_factory=lambda: CONSTANTS.SEED)
+    index: GraphIndex = field(default_factory=GraphIndex, init=False, repr=False)
+    # reachability index, one bitset (python int) per node: bit 'h' of
+    # '_descendants[x]' is set if the node with handle 'h' is reachable from
+    # x, '_ancestors' the other direction, both include x itself
+    _descendants: dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    _ancestors: dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    # generation layers, valid for one structural version of 'index'
+    _hierarchy: dict[int, set[str]] | None = field(default=None, init=False, repr=False)
+    _hierarchy_version: int = field(default=-1, init=False, repr=False)
+
+    def noise_seed(self, node: Node) -> np.random.SeedSequence:
+        return stream_seed(node.id_, self.seed)
 
     def get_nodes(self) -> list[Node]:
-        return [node for node in self.nodes.values() if node is not None]
+        # by handle -> stable order, a re-added node takes its old place
+        return [self.nodes[id_] for id_ in self.index.get_ids()]
 
     def get_node_ids(self) -> list[str]:
-        return [node.id_ for node in self.get_nodes()]
+        return self.index.get_ids()
 
     def get_node_names(self) -> list[str]:
         return [node.name for node in self.get_nodes()]
@@ -128,37 +188,46 @@ class Graph:
         return self.nodes.get(id_)
 
     def get_node_by_name(self, name: str) -> Node | None:
-        nodes = (node for node in self.get_nodes() if node.name == name)
-        return next(nodes, None)
+        handle = self.index.names.get(name)
+        if handle is None:
+            return None
+        id_ = self.index.ids[handle]
+        assert id_ is not None
+        return self.nodes[id_]
 
-    def get_free_node_id(self) -> str | None:
-        free_node_ids = (id for id, node in self.nodes.items() if node is None)
-        return next(free_node_ids, None)
+    def get_free_node_id(self) -> str:
+        return self.index.get_free_id()
 
     def add_node(self) -> None:
-        free_node_id = self.get_free_node_id()
-        if free_node_id is None:
-            raise Exception("Cannot add another node")
+        handle = self.index.add()
+        free_node_id = self.index.ids[handle]
+        assert free_node_id is not None
 
         new_node = Node(free_node_id, free_node_id, self)
         self.nodes[free_node_id] = new_node
         new_node.change_type("regression")
+        self._descendants[free_node_id] = 1 << handle
+        self._ancestors[free_node_id] = 1 << handle
 
     def remove_node(self, to_remove: Node) -> None:
         """
         Exception:
             node does not exist
         """
-        if self.nodes.get(to_remove.id_) is None:
+        node = self.nodes.get(to_remove.id_)
+        if node is None:
             raise Exception("Node does not exist")
 
-        for node in self.get_nodes():
-            if to_remove.id_ in [n.id_ for n in node.in_nodes]:
-                node.remove_in_node(to_remove)
-            if to_remove.id_ in [n.id_ for n in node.out_nodes]:
-                node.remove_out_node(to_remove)
+        # edge by edge -> the reachability index is updated incrementally
+        for in_node in list(node.in_nodes):
+            self.remove_edge(in_node, node)
+        for out_node in list(node.out_nodes):
+            self.remove_edge(node, out_node)
 
-        self.nodes[to_remove.id_] = None
+        self.index.remove(self.index.get_handle(node.id_))
+        del self.nodes[node.id_]
+        del self._descendants[node.id_]
+        del self._ancestors[node.id_]
 
     def add_edge(self, source: Node, target: Node) -> None:
         if self.can_add_edge(source, target) is False:
@@ -166,51 +235,100 @@ class Graph:
 
         source.add_out_node(target)
         target.add_in_node(source)
+        self.index.add_edge(
+            self.index.get_handle(source.id_), self.index.get_handle(target.id_)
+        )
+        # everything reaching the source now reaches everything the target does
+        descendants = self._descendants[target.id_]
+        ancestors = self._ancestors[source.id_]
+        for node_id in self._ids_of(ancestors):
+            self._descendants[node_id] |= descendants
+        for node_id in self._ids_of(descendants):
+            self._ancestors[node_id] |= ancestors
 
     def can_add_edge(self, source: Node, target: Node) -> bool:
-        target_in_nodes = target.get_in_node_ids()
-        source_out_nodes = source.get_out_node_ids()
-        if source.id_ in target_in_nodes and target.id_ in source_out_nodes:
-            return False
-
-        new_graph = deepcopy(self)
-        new_source = new_graph.get_node_by_id(source.id_)
-        new_target = new_graph.get_node_by_id(target.id_)
-        assert new_source is not None and new_target is not None
-        new_source.add_out_node(new_target)
-        new_target.add_in_node(new_source)
-
-        return not Graph.is_cyclic(new_graph)
+        """
+        would the edge keep the graph acyclic, a lookup in the reachability
+        index of the live graph, nothing is copied
+        Exception:
+            nodes not in the graph
+        """
+        if self.get_node_by_id(source.id_) is None:
+            raise Exception(f"Failed to find node with id: {source.id_}")
+        if self.get_node_by_id(target.id_) is None:
+            raise Exception(f"Failed to find node with id: {target.id_}")
 
-    @staticmethod
-    def is_cyclic(new_graph: "Graph") -> bool:
-        nodes = new_graph.get_nodes()
-        visited = {k.id_: False for k in nodes}
-        recursive_stack = {k.id_: False for k in nodes}
+        if target.has_in_node(source.id_) and source.has_out_node(target.id_):
+            return False
+        # cycle <=> source reachable from target (or source == target)
+        source_bit = 1 << self.index.get_handle(source.id_)
+        return self._descendants[target.id_] & source_bit == 0
 
-        for node in nodes:
-            if visited[node.id_] is False:
-                if Graph.is_cyclic_util(node, visited, recursive_stack, new_graph):
-                    return True
-        return False
+    def get_addable_targets(self, source: Node) -> set[str]:
+        """
+        ids of all nodes an edge from 'source' can be added to: neither an
+        ancestor of the source (cycle) nor already an out node
+        a single bitwise query instead of 'can_add_edge' per node
+        Exception:
+            node not in the graph
+        """
+        if self.get_node_by_id(source.id_) is None:
+            raise Exception(f"Failed to find node with id: {source.id_}")
+        blocked = self._ancestors[source.id_]
+        for out_node in source.out_nodes:
+            blocked |= 1 << self.index.get_handle(out_node.id_)
+        return set(self._ids_of(self.index.live & ~blocked))
+
+    def _ids_of(self, bits: int) -> list[str]:
+        # unpack all bits at once, a loop over the set bits is quadratic for
+        # large ints
+        nr_bytes = (self.index.capacity + 7) // 8
+        flags = np.unpackbits(
+            np.frombuffer(bits.to_bytes(nr_bytes, "little"), dtype=np.uint8),
+            bitorder="little",
+        )
+        ids = self.index.ids
+        return [ids[handle] for handle in np.flatnonzero(flags).tolist()]
 
-    @staticmethod
-    def is_cyclic_util(
-        node: Node,
-        visited: dict[str, bool],
-        recursive_stack: dict[str, bool],
-        new_graph: "Graph",
-    ) -> bool:
-        visited[node.id_] = True
-        recursive_stack[node.id_] = True
-        for neighbor in node.out_nodes:
-            if not visited[neighbor.id_]:
-                if Graph.is_cyclic_util(neighbor, visited, recursive_stack, new_graph):
-                    return True
-            elif recursive_stack[neighbor.id_]:
-                return True
-        recursive_stack[node.id_] = False
-        return False
+    def _update_closure(
+        self, affected: int, closure: dict[str, int], forward: bool
+    ) -> None:
+        """
+        recompute the bitsets of the 'affected' nodes after an edge was
+        removed, children (forward) or parents first, the bitsets of all other
+        nodes stay valid and are reused
+        """
+        affected_ids = set(self._ids_of(affected))
+        done: set[str] = set()
+        for start_id in affected_ids:
+            stack = [(start_id, False)]
+            while stack:
+                node_id, expanded = stack.pop()
+                if node_id in done:
+                    continue
+                node = self.nodes[node_id]
+                neighbours = node.out_nodes if forward else node.in_nodes
+                if not expanded:
+                    stack.append((node_id, True))
+                    stack.extend(
+                        (n.id_, False)
+                        for n in neighbours
+                        if n.id_ in affected_ids and n.id_ not in done
+                    )
+                    continue
+                bits = 1 << self.index.get_handle(node_id)
+                for neighbour in neighbours:
+                    bits |= closure[neighbour.id_]
+                closure[node_id] = bits
+                done.add(node_id)
+
+    def get_topological_order(self) -> list[str]:
+        """node ids layer by layer (cached), by handle within a layer"""
+        return [
+            node_id
+            for layer in self._get_generation_hierarchy().values()
+            for node_id in sorted(layer, key=self.index.get_handle)
+        ]
 
     def remove_edge(self, source: Node, target: Node) -> None:
         """
@@ -220,94 +338,341 @@ class Graph:
         if self._can_remove_edge(source, target) is False:
             raise Exception("Cannot remove edge")
 
-        source.out_nodes.remove(target)
-        target.in_nodes.remove(source)
+        source.remove_out_node(target)
+        target.remove_in_node(source)
+        self.index.remove_edge(
+            self.index.get_handle(source.id_), self.index.get_handle(target.id_)
+        )
+        # only ancestors of the source can lose descendants and only
+        # descendants of the target can lose ancestors
+        self._update_closure(self._ancestors[source.id_], self._descendants, True)
+        self._update_closure(self._descendants[target.id_], self._ancestors, False)
 
     def _can_remove_edge(self, source: Node, target: Node) -> bool:
-        source_removable = source.id_ in [n.id_ for n in target.in_nodes]
-        target_removable = target.id_ in [n.id_ for n in source.out_nodes]
-        return source_removable and target_removable
+        return target.has_in_node(source.id_) and source.has_out_node(target.id_)
 
     def _get_generation_hierarchy(self) -> dict[int, set[str]]:
-        all_nodes_ids = self.get_node_ids()
+        """
+        layers of node ids, every node only depends on nodes of earlier layers
+        kahn's algorithm with in-degree counters over the csr arrays, O(n + m),
+        computed once per structural version of the graph
+        Exception:
+            graph inconsistent (cycle or node lists not matching the edges)
+        """
+        version = self.index.version
+        if self._hierarchy is None or self._hierarchy_version != version:
+            self._hierarchy = self._compute_generation_hierarchy()
+            self._hierarchy_version = version
+        # copies, the cached layers stay untouched
+        return {layer: set(node_ids) for layer, node_ids in self._hierarchy.items()}
+
+    def _compute_generation_hierarchy(self) -> dict[int, set[str]]:
+        nr_in_nodes = sum(len(node.in_nodes) for node in self.nodes.values())
+        if nr_in_nodes != self.index.nr_edges:
+            raise Exception(
+                f"Graph is inconsistent: {nr_in_nodes} in nodes for "
+                f"{self.index.nr_edges} edges"
+            )
+
+        csr = self.index.csr()
+        in_degrees = csr.in_degrees()
+        used = np.array([id_ is not None for id_ in self.index.ids], dtype=np.bool_)
+        frontier = np.flatnonzero(used & (in_degrees == 0))
         hierarchy: dict[int, set[str]] = {}
-        available_node_ids = set(
-            [x.id_ for x in self.get_nodes() if len(x.get_in_node_ids()) == 0]
-        )
-        hierarchy[0] = available_node_ids
-        current_layer = 1
-        while len(available_node_ids) != len(all_nodes_ids):
-            unassigned_node_ids = [
-                x for x in all_nodes_ids if x not in available_node_ids
-            ]
-            next_layer_nodes = set()
-            for x in unassigned_node_ids:
-                node = self.get_node_by_id(x)
-                assert node is not None
-                in_nodes = set(node.get_in_node_ids())
-                if in_nodes.intersection(available_node_ids) == in_nodes:
-                    next_layer_nodes.add(x)
-            hierarchy[current_layer] = next_layer_nodes
-            current_layer += 1
-            available_node_ids = available_node_ids.union(next_layer_nodes)
+        nr_placed = 0
+        while len(frontier) > 0:
+            hierarchy[len(hierarchy)] = {self.index.ids[h] for h in frontier.tolist()}
+            nr_placed += len(frontier)
+            # successors of the whole layer at once
+            starts = csr.indptr[frontier]
+            counts = csr.indptr[frontier + 1] - starts
+            offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+            successors = csr.indices[offsets + np.arange(counts.sum())]
+            np.subtract.at(in_degrees, successors, 1)
+            successors = np.unique(successors)
+            frontier = successors[in_degrees[successors] == 0]
+
+        if nr_placed != len(self.index):
+            unplaced = sorted(set(self.nodes).difference(*hierarchy.values()))
+            raise Exception(
+                f"Graph is inconsistent: cannot place nodes in a layer: {unplaced}"
+            )
+        if len(hierarchy) == 0:
+            hierarchy[0] = set()
         return hierarchy
 
-    def generate_full_data_set(self) -> pd.DataFrame:
+    def _generate_node_data(
+        self,
+        node: Node,
+        noise: np.ndarray,
+        chunk_size: int | None,
+        dtype: DTypeLike,
+    ) -> int:
+        """
+        evaluate the mechanism of a single node, parents need to have data
+        returns the number of bytes copied to convert the inputs
+        Exception:
+            failed to evaluate
+        """
+        inputs: dict[str, np.ndarray] = {f"n_{node.id_}": noise}
+
+        for in_node_id in node.get_in_node_ids():
+            in_node = self.get_node_by_id(in_node_id)
+            if in_node is None or in_node.data is None:
+                raise Exception(f"Failed to find node with id: {in_node_id}")
+            inputs[in_node_id] = in_node.data
+
+        formulas = [x for x in node.mechanism_metadata.get_formulas().values()]
+        if len(formulas) < 1:
+            raise Exception("Invalid number of formulas found")
+
+        backend = get_backend(node.mechanism_metadata.backend)
+        match node.mechanism_metadata.mechanism_type:
+            case "classification":
+                mechanism = ClassificationMechanism(
+                    formulas=formulas,
+                    inputs=inputs,
+                    class_assignment=node.mechanism_metadata.class_assignment,
+                    chunk_size=chunk_size,
+                    backend=backend,
+                    dtype=dtype,
+                )
+                result = mechanism.transform()
+                if result.error is not None:
+                    raise Exception("Failed to evaluate")
+            case "regression":
+                mechanism = RegressionMechanism(
+                    formulas=formulas,
+                    inputs=inputs,
+                    chunk_size=chunk_size,
+                    backend=backend,
+                    dtype=dtype,
+                )
+                result = mechanism.transform()
+                if result.error is not None:
+                    raise Exception("Failed to evaluate")
+
+        assert result.values is not None
+        node.data = result.values
+        return mechanism.bytes_copied
+
+    def _generate_fused(
+        self,
+        node_ids: list[str],
+        noise: dict[str, np.ndarray],
+        chunk_size: int | None,
+        dtype: DTypeLike,
+    ) -> bool:
+        """
+        evaluate all nodes with one generated kernel, block by block
+        returns False if the graph cannot be fused
+        Exception:
+            failed to evaluate
+        """
+        nodes: list[Node] = []
+        for node_id in node_ids:
+            node = self.get_node_by_id(node_id)
+            if node is None:
+                raise Exception(f"Failed to find node with id: {node_id}")
+            nodes.append(node)
+
+        kernel = compile_fused_kernel(
+            tuple(
+                FusedNode(
+                    id_=node.id_,
+                    mechanism_type=node.mechanism_metadata.mechanism_type,
+                    formulas=tuple(node.mechanism_metadata.get_formulas().values()),
+                    in_node_ids=tuple(node.get_in_node_ids()),
+                    class_assignment=node.mechanism_metadata.class_assignment,
+                )
+                for node in nodes
+            )
+        )
+        if kernel is None:
+            return False
+
+        nr_rows = len(next(iter(noise.values())))
+        out = {
+            node.id_: np.empty(
+                nr_rows,
+                dtype=np.int32
+                if node.mechanism_metadata.mechanism_type == "classification"
+                else dtype,
+            )
+            for node in nodes
+        }
+        threaded = any(node.mechanism_metadata.backend == "threaded" for node in nodes)
+        backend = get_backend("threaded" if threaded else "numpy")
+        try:
+            backend.map(
+                lambda rows: kernel(noise, out, rows),
+                backend.row_slices(nr_rows, chunk_size or FUSED_CHUNK_SIZE),
+            )
+        except Exception as e:
+            raise Exception("Failed to evaluate") from e
+
+        for node in nodes:
+            node.data = out[node.id_]
+        return True
+
+    def _generate_dataflow(
+        self,
+        node_ids: list[str],
+        noise: dict[str, np.ndarray],
+        chunk_size: int | None,
+        dtype: DTypeLike,
+        sampling: SamplingMode | None,
+        nr_points: int | None,
+        max_workers: int,
+        report: GenerationReport,
+    ) -> None:
+        """
+        evaluate every node as soon as the data of its in nodes is ready, no
+        barrier between layers, independent nodes run on a thread pool
+        (numpy releases the GIL) and the results do not depend on the schedule
+        node_ids: topological order, also the order of a single worker
+        noise: pregenerated noise, missing entries are generated in the task
+        Exception:
+            failed to evaluate
+        """
+        run_start = time.perf_counter()
+
+        def evaluate(node: Node) -> int:
+            start = time.perf_counter()
+            node_noise = noise.get(node.id_)
+            if node_noise is None:
+                node_noise = node.noise.generate_data(
+                    self.noise_seed(node), dtype, sampling=sampling, nr_points=nr_points
+                )
+            noise_end = time.perf_counter()
+            bytes_copied = self._generate_node_data(node, node_noise, chunk_size, dtype)
+            end = time.perf_counter()
+            report.node_timings[node.id_] = NodeTiming(
+                start - run_start, end - run_start, noise_end - start
+            )
+            return bytes_copied
+
+        nodes = [self.nodes[node_id] for node_id in node_ids]
+        if max_workers <= 1:
+            for node in nodes:
+                report.bytes_copied += evaluate(node)
+            return
+
+        nr_waiting = {node.id_: len(node.in_nodes) for node in nodes}
+        running: dict[Future[int], Node] = {}
+        with ThreadPoolExecutor(max_workers, thread_name_prefix="generation") as pool:
+            for node in nodes:
+                if nr_waiting[node.id_] == 0:
+                    running[pool.submit(evaluate, node)] = node
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    try:
+                        report.bytes_copied += future.result()
+                    except Exception:
+                        for pending in running:
+                            pending.cancel()
+                        raise
+                    for out_node in node.out_nodes:
+                        nr_waiting[out_node.id_] -= 1
+                        if nr_waiting[out_node.id_] == 0:
+                            running[pool.submit(evaluate, out_node)] = out_node
+
+    def generate_full_data_set(
+        self,
+        chunk_size: int | None = None,
+        fused: bool = False,
+        dtype: DTypeLike = np.float64,
+        sampling: SamplingMode | None = None,
+        nr_points: int | None = None,
+        max_workers: int = 1,
+    ) -> pd.DataFrame:
+        """
+        chunk_size: rows per block for mechanism evaluation, None -> all at once
+        the backend (single or multi threaded) is chosen per node
+        fused: evaluate the whole scm with one generated kernel, falls back to
+        node by node evaluation if a formula cannot be fused
+        dtype: float type of noise, mechanisms and output, e.g. np.float32
+        sampling: sampling mode for the noise of all nodes, None -> per node
+        nr_points: number of rows, None -> 'CONSTANTS.NR_DATA_POINTS'
+        max_workers: threads evaluating nodes in parallel (opt in, e.g.
+        'os.cpu_count()'), 1 -> one node after the other in topological order
+        Exception:
+            formulas not locked or failed to evaluate
+        """
         if not all(x.mechanism_metadata.state == "locked" for x in self.get_nodes()):
             raise Exception("All formulas need to be locked before generating data")
 
+        report = GenerationReport(max_workers=max_workers)
+        run_start = time.perf_counter()
         hierarchy = self._get_generation_hierarchy()
-        for layer in hierarchy.values():
-            for node_id in layer:
-                node = self.get_node_by_id(node_id)
-                if node is None:
-                    raise Exception(f"Failed to find node with id: {node_id}")
-
-                inputs: dict[str, np.ndarray] = {
-                    f"n_{node_id}": node.noise.generate_data()
-                }
-
-                for in_node_id in node.get_in_node_ids():
-                    in_node = self.get_node_by_id(in_node_id)
-                    if in_node is None or in_node.data is None:
-                        raise Exception(f"Failed to find node with id: {in_node_id}")
-                    inputs[in_node_id] = in_node.data
-
-                formulas = [x for x in node.mechanism_metadata.get_formulas().values()]
-                if len(formulas) < 1:
-                    raise Exception("Invalid number of formulas found")
-
-                match node.mechanism_metadata.mechanism_type:
-                    case "classification":
-                        mechanism = ClassificationMechanism(
-                            formulas=formulas, inputs=inputs
-                        )
-                        result = mechanism.transform()
-                        if result.error is not None:
-                            raise Exception("Failed to evaluate")
-                    case "regression":
-                        mechanism = RegressionMechanism(
-                            formulas=formulas, inputs=inputs
-                        )
-                        result = mechanism.transform()
-                        if result.error is not None:
-                            raise Exception("Failed to evaluate")
-
-                assert result.values is not None
-                node.data = result.values
+        node_ids = [node_id for layer in hierarchy.values() for node_id in layer]
+        noise: dict[str, np.ndarray] = {}
+        if fused:
+            # the kernel needs the noise of all nodes at once
+            noise = {
+                node.id_: node.noise.generate_data(
+                    self.noise_seed(node), dtype, sampling=sampling, nr_points=nr_points
+                )
+                for node in self.get_nodes()
+            }
+        if not (fused and self._generate_fused(node_ids, noise, chunk_size, dtype)):
+            self._generate_dataflow(
+                node_ids,
+                noise,
+                chunk_size,
+                dtype,
+                sampling,
+                nr_points,
+                max_workers,
+                report,
+            )
+
+        report.wall_time = time.perf_counter() - run_start
+        self.last_generation = report
 
         dataframe = pd.DataFrame.from_dict(
-            {
-                node_id: node.data
-                for node_id, node in self.nodes.items()
-                if node is not None
-            }
+            {node.id_: node.data for node in self.get_nodes()}
         )
         if sorted(dataframe.columns.tolist()) != sorted(self.get_node_ids()):
             raise Exception("Inconsisten columns")
 
         return dataframe
 
+    def precision_drift(
+        self, dtype: DTypeLike = np.float32, **kwargs: Any
+    ) -> pd.DataFrame:
+        """
+        compare generation in 'dtype' with the float64 reference per column:
+        max absolute/relative error and, for classification nodes, the share of
+        rows that end up in another class (nan for regression nodes)
+        the noise is drawn from the same streams, only the precision differs
+        kwargs are passed to 'generate_full_data_set'
+        """
+        reduced = self.generate_full_data_set(dtype=dtype, **kwargs)
+        reference = self.generate_full_data_set(dtype=np.float64, **kwargs)
+        classification_ids = {
+            node.id_
+            for node in self.get_nodes()
+            if node.mechanism_metadata.mechanism_type == "classification"
+        }
+        drift: dict[str, dict[str, float]] = {}
+        for column in reference.columns:
+            expected = reference[column].to_numpy(dtype=np.float64)
+            actual = reduced[column].to_numpy(dtype=np.float64)
+            error = np.abs(actual - expected)
+            drift[column] = {
+                "max_abs_error": float(np.max(error, initial=0.0)),
+                "max_rel_error": float(
+                    np.max(error / np.maximum(np.abs(expected), 1e-12), initial=0.0)
+                ),
+                "mismatch_rate": float(np.mean(actual != expected))
+                if column in classification_ids
+                else np.nan,
+            }
+        return pd.DataFrame.from_dict(drift, orient="index")
+
 
 # TODO: initial graph setup -> replace with imported settings if available
 graph = Graph()
@@ -0,0 +1,226 @@
+import builtins
+import heapq
+import itertools
+import keyword
+import string
+from dataclasses import dataclass, field
+from typing import Iterator
+
+import numpy as np
+
+from models import mechanism
+
+# node ids are variable names in formulas -> no python keywords, builtins or
+# functions available to formulas (a node 'exp' would hide 'exp(...)')
+RESERVED_NODE_IDS = (
+    frozenset(keyword.kwlist) | frozenset(dir(builtins)) | frozenset(vars(mechanism))
+)
+
+
+def _bijective_base26(position: int) -> str:
+    # 0 -> 'a', 25 -> 'z', 26 -> 'aa', 701 -> 'zz', 702 -> 'aaa'
+    letters = []
+    position += 1
+    while position > 0:
+        position, remainder = divmod(position - 1, 26)
+        letters.append(string.ascii_lowercase[remainder])
+    return "".join(reversed(letters))
+
+
+def _generate_node_ids() -> Iterator[str]:
+    for position in itertools.count():
+        id_ = _bijective_base26(position)
+        if id_ not in RESERVED_NODE_IDS:
+            yield id_
+
+
+_NODE_IDS = _generate_node_ids()
+_NODE_ID_CACHE: list[str] = []
+
+
+def node_id(handle: int) -> str:
+    """
+    stable string id of a handle: a, ..., z, aa, ab, ... without reserved names
+    """
+    while len(_NODE_ID_CACHE) <= handle:
+        _NODE_ID_CACHE.append(next(_NODE_IDS))
+    return _NODE_ID_CACHE[handle]
+
+
+@dataclass(frozen=True)
+class CSRAdjacency:
+    """
+    compressed sparse rows of the edges, handle 'h' has the successors
+    'indices[indptr[h]:indptr[h + 1]]' and the predecessors
+    'reverse_indices[reverse_indptr[h]:reverse_indptr[h + 1]]'
+    both sorted by handle, rows of free handles are empty
+    """
+
+    indptr: np.ndarray
+    indices: np.ndarray
+    reverse_indptr: np.ndarray
+    reverse_indices: np.ndarray
+
+    def successors(self, handle: int) -> np.ndarray:
+        return self.indices[self.indptr[handle] : self.indptr[handle + 1]]
+
+    def predecessors(self, handle: int) -> np.ndarray:
+        return self.reverse_indices[
+            self.reverse_indptr[handle] : self.reverse_indptr[handle + 1]
+        ]
+
+    def in_degrees(self) -> np.ndarray:
+        return np.diff(self.reverse_indptr)
+
+    def out_degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+
+def _build_csr(edges: np.ndarray, nr_handles: int) -> tuple[np.ndarray, np.ndarray]:
+    # edges: (m, 2) -> rows by the first column, sorted by the second
+    order = np.lexsort((edges[:, 1], edges[:, 0]))
+    indices = edges[order, 1]
+    counts = np.bincount(edges[:, 0], minlength=nr_handles)
+    indptr = np.zeros(nr_handles + 1, dtype=np.intp)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, indices
+
+
+@dataclass
+class GraphIndex:
+    """
+    integer handles of the nodes of a graph
+    ids <-> handles and names -> handles in O(1), the edges as a set of handle
+    pairs for O(1) membership and as csr arrays for bulk traversal
+    the csr arrays are rebuilt lazily after the structure changed, incremental
+    updates (single edges) should not depend on them
+    handles of removed nodes are reused, lowest first
+    """
+
+    # handle -> id, None for a free handle
+    ids: list[str | None] = field(default_factory=list)
+    handles: dict[str, int] = field(default_factory=dict)
+    names: dict[str, int] = field(default_factory=dict)
+    # structural version, increased on every node/edge change
+    version: int = 0
+    # bitset of the handles in use
+    live: int = 0
+    _free: list[int] = field(default_factory=list, repr=False)
+    _edges: set[tuple[int, int]] = field(default_factory=set, repr=False)
+    _csr: CSRAdjacency | None = field(default=None, repr=False)
+    _csr_version: int = field(default=-1, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.handles)
+
+    def __contains__(self, id_: str) -> bool:
+        return id_ in self.handles
+
+    @property
+    def capacity(self) -> int:
+        """number of handles, used and free, bitsets/arrays need this size"""
+        return len(self.ids)
+
+    @property
+    def nr_edges(self) -> int:
+        return len(self._edges)
+
+    def get_ids(self) -> list[str]:
+        """ids of all nodes by handle"""
+        return [id_ for id_ in self.ids if id_ is not None]
+
+    def get_free_id(self) -> str:
+        return node_id(self._free[0] if self._free else len(self.ids))
+
+    def get_handle(self, id_: str) -> int:
+        """
+        Exception:
+            no node with this id
+        """
+        handle = self.handles.get(id_)
+        if handle is None:
+            raise Exception(f"Failed to find node with id: {id_}")
+        return handle
+
+    def add(self, name: str | None = None) -> int:
+        """
+        register a node at the lowest free handle, name defaults to the id
+        Exception:
+            name already in use
+        """
+        handle = heapq.heappop(self._free) if self._free else len(self.ids)
+        id_ = node_id(handle)
+        name = id_ if name is None else name
+        if name in self.names:
+            if handle < len(self.ids):
+                heapq.heappush(self._free, handle)
+            raise Exception(f"Node name already in use: {name}")
+
+        if handle == len(self.ids):
+            self.ids.append(id_)
+        else:
+            self.ids[handle] = id_
+        self.handles[id_] = handle
+        self.names[name] = handle
+        self.live |= 1 << handle
+        self.version += 1
+        return handle
+
+    def remove(self, handle: int) -> None:
+        """
+        remove a node and all its edges
+        Exception:
+            handle not in use
+        """
+        if handle >= len(self.ids) or self.ids[handle] is None:
+            raise Exception(f"Handle not in use: {handle}")
+
+        csr = self.csr()
+        for target in csr.successors(handle):
+            self._edges.discard((handle, int(target)))
+        for source in csr.predecessors(handle):
+            self._edges.discard((int(source), handle))
+
+        id_ = self.ids[handle]
+        assert id_ is not None
+        del self.handles[id_]
+        self.names = {
+            name: other for name, other in self.names.items() if other != handle
+        }
+        self.ids[handle] = None
+        self.live &= ~(1 << handle)
+        heapq.heappush(self._free, handle)
+        self.version += 1
+
+    def has_edge(self, source: int, target: int) -> bool:
+        return (source, target) in self._edges
+
+    def add_edge(self, source: int, target: int) -> None:
+        """
+        Exception:
+            edge already exists
+        """
+        if (source, target) in self._edges:
+            raise Exception("Edge already exists")
+        self._edges.add((source, target))
+        self.version += 1
+
+    def remove_edge(self, source: int, target: int) -> None:
+        """
+        Exception:
+            edge does not exist
+        """
+        if (source, target) not in self._edges:
+            raise Exception("Edge does not exist")
+        self._edges.remove((source, target))
+        self.version += 1
+
+    def csr(self) -> CSRAdjacency:
+        """forward and reverse csr arrays of the current structure"""
+        if self._csr is None or self._csr_version != self.version:
+            edges = np.array(sorted(self._edges), dtype=np.intp).reshape(-1, 2)
+            indptr, indices = _build_csr(edges, len(self.ids))
+            reverse_indptr, reverse_indices = _build_csr(edges[:, ::-1], len(self.ids))
+            self._csr = CSRAdjacency(indptr, indices, reverse_indptr, reverse_indices)
+            self._csr_version = self.version
+        return self._csr
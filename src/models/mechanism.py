@@ -1,10 +1,18 @@
 import ast
+import math
+import operator
+import os
 import string
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
 from dataclasses import dataclass, field
-from typing import Any, Literal
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Literal, TypeVar
 
 import numpy as np
-from numpy.typing import NDArray
+from numpy.typing import DTypeLike, NDArray
 
 #
 # supported 'builtin' functions
@@ -45,9 +53,44 @@ clip = np.clip
 cbrt = np.cbrt
 fabs = np.fabs
 
+# functions above (+ builtin abs) that work element by element
+ELEMENTWISE_FUNCTIONS = frozenset(
+    [
+        "sin",
+        "cos",
+        "tan",
+        "arcsin",
+        "arccos",
+        "arctan",
+        "arctan2",
+        "sinh",
+        "cosh",
+        "tanh",
+        "arcsinh",
+        "arccosh",
+        "arctanh",
+        "round",
+        "floor",
+        "ceil",
+        "exp",
+        "log",
+        "log10",
+        "log2",
+        "sqrt",
+        "clip",
+        "cbrt",
+        "fabs",
+        "abs",
+    ]
+)
 
 MechanismType = Literal["regression", "classification"]
 MechanismState = Literal["editable", "locked"]
+# strict: classes must not overlap, every class is evaluated on all rows
+# first_match: first matching class wins, later classes only see unassigned rows
+ClassAssignment = Literal["strict", "first_match"]
+# numpy: single thread, threaded: rows split across a thread pool
+BackendName = Literal["numpy", "threaded"]
 
 
 @dataclass
@@ -56,6 +99,8 @@ class MechanismMetadata:
     mechanism_type: MechanismType = "regression"
     state: MechanismState = "editable"
     valid: bool = True
+    class_assignment: ClassAssignment = "strict"
+    backend: BackendName = "numpy"
     formulas: dict[str, str | None] = field(init=False)  # depends on the type
 
     def __post_init__(self) -> None:
@@ -72,6 +117,13 @@ class MechanismMetadata:
     def get_formulas(self):
         return {k: v for k, v in self.formulas.items() if v is not None}
 
+    def get_optimized_formulas(self, input_names: Iterable[str]) -> dict[str, str]:
+        """formulas as they are evaluated, e.g. 'n_a*1.0' -> 'n_a'"""
+        return {
+            k: optimize_formula(v, frozenset(input_names))
+            for k, v in self.get_formulas().items()
+        }
+
     def get_class_by_id(self, id_: str) -> str | None:
         return self.formulas.get(id_)
 
@@ -97,6 +149,458 @@ class MechanismMetadata:
         self.formulas[class_id] = None
 
 
+def is_elementwise(tree: ast.AST) -> bool:
+    """
+    True if every row of the result only depends on the same row of the inputs,
+    e.g. 'sin(a) + b > 0' but not 'a - a.mean()' or 'a @ b'
+    """
+    allowed = (
+        ast.Expression,
+        ast.BinOp,
+        ast.UnaryOp,
+        ast.Compare,
+        ast.Call,
+        ast.keyword,
+        ast.Name,
+        ast.Constant,
+        ast.operator,
+        ast.unaryop,
+        ast.cmpop,
+        ast.expr_context,
+    )
+    for node in ast.walk(tree):
+        if not isinstance(node, allowed) or isinstance(node, ast.MatMult):
+            return False
+        if isinstance(node, ast.Call) and not (
+            isinstance(node.func, ast.Name) and node.func.id in ELEMENTWISE_FUNCTIONS
+        ):
+            return False
+    return True
+
+
+@dataclass
+class CompiledFormula:
+    formula: str
+    arg_names: tuple[str, ...]
+    function: Callable[..., Any]
+    elementwise: bool = False
+
+    def __call__(self, values: dict[str, np.ndarray]) -> Any:
+        return self.function(*[values[name] for name in self.arg_names])
+
+
+def compile_formula(formula: str, input_names: Iterable[str]) -> CompiledFormula:
+    """
+    turn a formula into a lambda with one positional argument per used input,
+    e.g. 'a + n_b' with inputs {a, n_b, c} -> lambda a, n_b: a + n_b
+    Exception:
+        formula is not a single expression
+    """
+    tree = ast.parse(formula, mode="eval")
+    used_names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    arg_names = tuple(sorted(used_names.intersection(input_names)))
+    function_tree = ast.Expression(
+        body=ast.Lambda(
+            args=ast.arguments(
+                posonlyargs=[],
+                args=[ast.arg(arg=name) for name in arg_names],
+                kwonlyargs=[],
+                kw_defaults=[],
+                defaults=[],
+            ),
+            body=tree.body,
+        )
+    )
+    ast.fix_missing_locations(function_tree)
+    code = compile(function_tree, "<formula>", "eval")
+    # module globals -> supported 'builtin' functions defined above
+    function = eval(code, globals())
+    return CompiledFormula(formula, arg_names, function, is_elementwise(tree))
+
+
+class FormulaCache:
+    """bounded LRU cache of compiled formulas, keyed by formula and input names"""
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[
+            tuple[str, frozenset[str]], CompiledFormula
+        ] = OrderedDict()
+        # mechanisms may be evaluated from several threads
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, formula: str, input_names: Iterable[str]) -> CompiledFormula:
+        key = (formula, frozenset(input_names))
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return compiled
+
+            self.misses += 1
+            compiled = compile_formula(formula, key[1])
+            self._entries[key] = compiled
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return compiled
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+FORMULA_CACHE = FormulaCache()
+
+_FOLDABLE_OPERATORS: dict[type[ast.AST], Callable[..., Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+# f(g(x)) == x for every real x
+_INVERSE_PAIRS = {("log", "exp"), ("arcsinh", "sinh")}
+
+
+def _is_number(node: ast.AST, value: float | None = None) -> bool:
+    return (
+        isinstance(node, ast.Constant)
+        and isinstance(node.value, (int, float))
+        and not isinstance(node.value, bool)
+        and (value is None or node.value == value)
+    )
+
+
+def _is_float(node: ast.AST) -> bool:
+    """True if the expression is a float (array) for float inputs"""
+    match node:
+        case ast.Name():
+            return node.id not in ELEMENTWISE_FUNCTIONS
+        case ast.Constant():
+            return isinstance(node.value, float)
+        case ast.BinOp(op=ast.Div()):
+            return True
+        case ast.BinOp(
+            op=ast.Add()
+            | ast.Sub()
+            | ast.Mult()
+            | ast.Pow()
+            | ast.Mod()
+            | ast.FloorDiv()
+        ):
+            return _is_float(node.left) or _is_float(node.right)
+        case ast.UnaryOp(op=ast.USub() | ast.UAdd()):
+            return _is_float(node.operand)
+        case ast.Call(func=ast.Name()):
+            return any(_is_float(arg) for arg in node.args)
+        case _:
+            return False
+
+
+def _is_small_power(base: float, exponent: float) -> bool:
+    # result within the float range -> no huge ints are built, '9**9**9' is
+    # not evaluated
+    return abs(base) <= 1 or abs(exponent) * math.log2(abs(base)) <= 1024
+
+
+class _FormulaOptimizer(ast.NodeTransformer):
+    """
+    constant folding and removal of identities, e.g.
+    '2*3*a + 0*b + log(exp(c))' -> '6*a + c'
+    identities are only removed for float operands, '(a > 0) * 1' stays an int
+    """
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        left, right, op = node.left, node.right, node.op
+        if _is_number(left) and _is_number(right):
+            left_value, right_value = left.value, right.value  # type: ignore
+            if isinstance(op, ast.Pow) and not _is_small_power(left_value, right_value):
+                return node
+            try:
+                value = _FOLDABLE_OPERATORS[type(op)](left_value, right_value)
+                # OverflowError for ints beyond the float range
+                finite = isinstance(value, (int, float)) and math.isfinite(float(value))
+            except (KeyError, ArithmeticError, ValueError):
+                return node
+            return ast.Constant(value) if finite else node
+
+        match op:
+            case ast.Mult():
+                for one, other in [(left, right), (right, left)]:
+                    if _is_number(one, 1) and _is_float(other):
+                        return other
+                    if _is_number(one, 0) and _is_float(other):
+                        return ast.Constant(0.0)
+            case ast.Add():
+                for zero, other in [(left, right), (right, left)]:
+                    if _is_number(zero, 0) and _is_float(other):
+                        return other
+            case ast.Sub() if _is_number(right, 0) and _is_float(left):
+                return left
+            case ast.Div() | ast.Pow() if _is_number(right, 1) and _is_float(left):
+                return left
+        return node
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.AST:
+        self.generic_visit(node)
+        operand = node.operand
+        if _is_number(operand) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            fold = _FOLDABLE_OPERATORS[type(node.op)]
+            return ast.Constant(fold(operand.value))  # type: ignore
+        if isinstance(node.op, ast.UAdd) and _is_float(operand):
+            return operand
+        if (
+            isinstance(node.op, ast.USub)
+            and isinstance(operand, ast.UnaryOp)
+            and isinstance(operand.op, ast.USub)
+            and _is_float(operand.operand)
+        ):
+            return operand.operand
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        self.generic_visit(node)
+        match node:
+            case ast.Call(
+                func=ast.Name(id=outer),
+                args=[ast.Call(func=ast.Name(id=inner), args=[argument], keywords=[])],
+                keywords=[],
+            ) if (outer, inner) in _INVERSE_PAIRS and _is_float(argument):
+                return argument
+        return node
+
+
+def _has_inputs(tree: ast.AST) -> bool:
+    return any(
+        isinstance(node, ast.Name) and node.id not in ELEMENTWISE_FUNCTIONS
+        for node in ast.walk(tree)
+    )
+
+
+class _NegateConstants(ast.NodeTransformer):
+    """
+    folded negative constants back to '-(constant)', same as parsed source
+    'ast.unparse' only keeps the parentheses of '(-1) ** a' for a unary minus
+    """
+
+    def visit_Constant(self, node: ast.Constant) -> ast.AST:
+        if _is_number(node) and node.value < 0:
+            return ast.UnaryOp(op=ast.USub(), operand=ast.Constant(-node.value))
+        return node
+
+
+def _optimize_tree(tree: ast.Expression) -> ast.Expression:
+    optimized = _FormulaOptimizer().visit(deepcopy(tree))
+    if _has_inputs(tree) and not _has_inputs(optimized):
+        # e.g. '0*a' -> keep the shape of the inputs
+        return tree
+    return ast.fix_missing_locations(_NegateConstants().visit(optimized))
+
+
+def _uses_only(tree: ast.AST, input_names: Iterable[str]) -> bool:
+    known = set(input_names) | ELEMENTWISE_FUNCTIONS
+    return all(
+        node.id in known for node in ast.walk(tree) if isinstance(node, ast.Name)
+    )
+
+
+@lru_cache(maxsize=256)
+def optimize_formula(formula: str, input_names: frozenset[str]) -> str:
+    """
+    formula that is actually evaluated after constant folding and simplification
+    formulas that are not elementwise or use unknown names are not changed
+    """
+    try:
+        tree = ast.parse(formula, mode="eval")
+    except SyntaxError:
+        return formula
+    if not is_elementwise(tree) or not _uses_only(tree, input_names):
+        return formula
+    optimized = _optimize_tree(tree)
+    return formula if optimized is tree else ast.unparse(optimized)
+
+
+# names of shared subexpressions, cannot clash with node ids or noise names
+CSE_PREFIX = "_cse_"
+
+
+@dataclass(frozen=True)
+class FormulaPlan:
+    # (name, expression) in evaluation order, later entries may use earlier names
+    temporaries: tuple[tuple[str, str], ...]
+    # same order as the input formulas, may use the temporaries
+    formulas: tuple[str, ...]
+
+
+class _ReplaceSubexpression(ast.NodeTransformer):
+    def __init__(self, key: str, name: str) -> None:
+        self.key = key
+        self.name = name
+
+    def visit(self, node: ast.AST) -> ast.AST:
+        if isinstance(node, ast.expr) and ast.dump(node) == self.key:
+            return ast.Name(id=self.name, ctx=ast.Load())
+        return self.generic_visit(node)
+
+
+def _is_shareable(node: ast.AST) -> bool:
+    # constant expressions like '-1.0' are not worth a temporary
+    return isinstance(
+        node, (ast.BinOp, ast.UnaryOp, ast.Call, ast.Compare)
+    ) and _has_inputs(node)
+
+
+@lru_cache(maxsize=256)
+def plan_formulas(
+    formulas: tuple[str, ...], input_names: frozenset[str]
+) -> FormulaPlan:
+    """
+    formulas are optimized first (see 'optimize_formula'), followed by
+    common subexpression elimination across all formulas of a node, e.g.
+    'a + b > 0', 'a + b < -1' -> _cse_0 = a + b; '_cse_0 > 0', '_cse_0 < -1'
+    only elementwise formulas take part, the largest repeated expression is
+    extracted first
+    """
+    trees: dict[int, ast.Expression] = {}
+    for idx, formula in enumerate(formulas):
+        try:
+            tree = ast.parse(formula, mode="eval")
+        except SyntaxError:
+            continue
+        if is_elementwise(tree) and _uses_only(tree, input_names):
+            trees[idx] = _optimize_tree(tree)
+
+    definitions: dict[str, ast.Expression] = {}
+    while True:
+        occurrences: dict[str, list[ast.AST]] = {}
+        for tree in [*trees.values(), *definitions.values()]:
+            for node in ast.walk(tree):
+                if _is_shareable(node):
+                    occurrences.setdefault(ast.dump(node), []).append(node)
+        repeated = [nodes[0] for nodes in occurrences.values() if len(nodes) > 1]
+        if len(repeated) == 0:
+            break
+
+        largest = max(repeated, key=lambda node: len(list(ast.walk(node))))
+        name = f"{CSE_PREFIX}{len(definitions)}"
+        replace = _ReplaceSubexpression(ast.dump(largest), name)
+        for tree in [*trees.values(), *definitions.values()]:
+            replace.visit(tree)
+        definitions[name] = ast.Expression(body=deepcopy(largest))
+
+    # temporaries can depend on each other -> dependencies first
+    ordered: list[str] = []
+
+    def add_definition(name: str) -> None:
+        if name in ordered:
+            return
+        for node in ast.walk(definitions[name]):
+            if isinstance(node, ast.Name) and node.id in definitions:
+                add_definition(node.id)
+        ordered.append(name)
+
+    for name in definitions:
+        add_definition(name)
+
+    return FormulaPlan(
+        tuple((name, ast.unparse(definitions[name])) for name in ordered),
+        tuple(
+            ast.unparse(trees[idx]) if idx in trees else formula
+            for idx, formula in enumerate(formulas)
+        ),
+    )
+
+
+T = TypeVar("T")
+
+
+class MechanismBackend:
+    """runs a kernel over blocks of rows, the kernel writes its own output"""
+
+    def row_slices(self, nr_rows: int, chunk_size: int | None) -> list[slice]:
+        if chunk_size is None or chunk_size >= nr_rows:
+            return [slice(0, nr_rows)]
+        return [
+            slice(start, min(start + chunk_size, nr_rows))
+            for start in range(0, nr_rows, chunk_size)
+        ]
+
+    def map(self, kernel: Callable[[slice], T], row_slices: list[slice]) -> list[T]:
+        raise NotImplementedError()
+
+
+class NumpyBackend(MechanismBackend):
+    def map(self, kernel: Callable[[slice], T], row_slices: list[slice]) -> list[T]:
+        return [kernel(rows) for rows in row_slices]
+
+
+class ThreadedBackend(MechanismBackend):
+    """
+    numpy releases the GIL in ufunc loops -> blocks of rows run in parallel
+    the number of threads grows with the number of rows
+    """
+
+    def __init__(
+        self, max_workers: int | None = None, min_rows_per_thread: int = 50_000
+    ) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_rows_per_thread = min_rows_per_thread
+        self._executor: ThreadPoolExecutor | None = None
+        # nodes of a graph may be evaluated from several threads at once
+        self._lock = threading.Lock()
+
+    def nr_threads(self, nr_rows: int) -> int:
+        return max(1, min(self.max_workers, nr_rows // self.min_rows_per_thread))
+
+    def row_slices(self, nr_rows: int, chunk_size: int | None) -> list[slice]:
+        if chunk_size is not None:
+            return super().row_slices(nr_rows, chunk_size)
+        bounds = np.linspace(0, nr_rows, self.nr_threads(nr_rows) + 1, dtype=int)
+        return [slice(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def map(self, kernel: Callable[[slice], T], row_slices: list[slice]) -> list[T]:
+        if len(row_slices) <= 1:
+            return [kernel(rows) for rows in row_slices]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.max_workers, thread_name_prefix="mechanism"
+                )
+            executor = self._executor
+        return list(executor.map(kernel, row_slices))
+
+
+MECHANISM_BACKENDS: dict[BackendName, MechanismBackend] = {
+    "numpy": NumpyBackend(),
+    "threaded": ThreadedBackend(),
+}
+
+
+def get_backend(name: BackendName) -> MechanismBackend:
+    """
+    Exception:
+        unknown backend
+    """
+    backend = MECHANISM_BACKENDS.get(name)
+    if backend is None:
+        raise Exception(f"Unknown backend: {name}")
+    return backend
+
+
 @dataclass
 class MechanismResult:
     values: NDArray | None
@@ -104,66 +608,363 @@ class MechanismResult:
 
 
 class BaseMechanism:
-    def __init__(self, formulas: list[str], inputs: dict[str, np.ndarray]):
+    def __init__(
+        self,
+        formulas: list[str],
+        inputs: dict[str, np.ndarray],
+        chunk_size: int | None = None,
+        backend: MechanismBackend | None = None,
+        dtype: DTypeLike = np.float64,
+    ):
+        """
+        chunk_size: evaluate elementwise formulas on blocks of rows, this bounds
+        the memory of temporaries to the block size, None -> all rows at once
+        backend: runs the blocks, default is the single threaded numpy backend
+        dtype: float type the inputs are evaluated in
+        """
         self.formulas = formulas
         self.inputs = inputs
-        self.values = {k: np.array(v, dtype=np.float64) for k, v in self.inputs.items()}
+        self.dtype = np.dtype(dtype)
+        self.bytes_copied = 0
+        self.values = {k: self._as_input(v) for k, v in self.inputs.items()}
+        self.chunk_size = chunk_size
+        self.backend = backend or MECHANISM_BACKENDS["numpy"]
+
+    def _as_input(self, value: Any) -> NDArray[np.floating]:
+        """
+        read-only view of contiguous arrays with the right dtype, everything else
+        is converted (and counted in 'bytes_copied')
+        """
+        if (
+            isinstance(value, np.ndarray)
+            and value.dtype == self.dtype
+            and value.flags.c_contiguous
+        ):
+            array = value.view()
+        else:
+            array = np.ascontiguousarray(value, dtype=self.dtype)
+            self.bytes_copied += array.nbytes
+        array.flags.writeable = False
+        return array
+
+    def _nr_rows(self) -> int:
+        return len(next(iter(self.values.values())))
+
+    def _row_slices(self, nr_rows: int) -> list[slice]:
+        return self.backend.row_slices(nr_rows, self.chunk_size)
+
+    @staticmethod
+    def _slice_values(
+        values: dict[str, np.ndarray], rows: slice
+    ) -> dict[str, np.ndarray]:
+        return {k: v[rows] for k, v in values.items()}
+
+    @staticmethod
+    def _with_temporaries(
+        values: dict[str, np.ndarray], plan: FormulaPlan
+    ) -> dict[str, np.ndarray]:
+        """
+        a failing temporary is left out, every formula using it then fails on
+        its own and is reported like any other invalid formula
+        """
+        if len(plan.temporaries) == 0:
+            return values
+        values = dict(values)
+        for name, expression in plan.temporaries:
+            try:
+                values[name] = FORMULA_CACHE.get(expression, values.keys())(values)
+            except Exception:
+                continue
+        return values
 
     def transform(self) -> MechanismResult:
         raise NotImplementedError()
 
 
 class RegressionMechanism(BaseMechanism):
+    def _evaluate(self, plan: FormulaPlan, values: dict[str, np.ndarray]) -> Any:
+        values = self._with_temporaries(values, plan)
+        return FORMULA_CACHE.get(plan.formulas[0], values.keys())(values)
+
+    def _evaluate_chunked(self, plan: FormulaPlan, row_slices: list[slice]) -> Any:
+        first_rows = row_slices[0]
+        first = self._evaluate(plan, self._slice_values(self.values, first_rows))
+        if not isinstance(first, np.ndarray) or first.shape[:1] != (
+            first_rows.stop - first_rows.start,
+        ):
+            # e.g. constant formula -> no rows to split
+            return self._evaluate(plan, self.values)
+
+        dtype = self.dtype if np.issubdtype(first.dtype, np.floating) else first.dtype
+        result = np.empty((self._nr_rows(),) + first.shape[1:], dtype=dtype)
+        result[first_rows] = first
+
+        def kernel(rows: slice) -> None:
+            result[rows] = self._evaluate(plan, self._slice_values(self.values, rows))
+
+        self.backend.map(kernel, row_slices[1:])
+        return result
+
     def transform(self) -> MechanismResult:
-        tree = ast.parse(self.formulas[0])
-        for node in ast.walk(tree):
-            # replace variables with inputs
-            if isinstance(node, ast.Name) and node.id in self.inputs.keys():
-                node.id = f'self.values["{node.id}"]'
-        new_formula = ast.unparse(tree)
         try:
-            result: NDArray[np.float64] = eval(new_formula)
+            compiled = FORMULA_CACHE.get(self.formulas[0], self.values.keys())
+            plan = plan_formulas((self.formulas[0],), frozenset(self.values))
+            row_slices = self._row_slices(self._nr_rows())
+            if len(row_slices) > 1 and compiled.elementwise:
+                result: NDArray[np.float64] = self._evaluate_chunked(plan, row_slices)
+            else:
+                result = self._evaluate(plan, self.values)
         except:
             return MechanismResult(None, "Failed to evaluate formula")
 
+        if isinstance(result, np.ndarray) and np.issubdtype(result.dtype, np.floating):
+            # python scalars in a formula may promote float32 inputs to float64
+            # (value based casting), bool/int results keep their dtype
+            result = result.astype(self.dtype, copy=False)
+
         return MechanismResult(result, None)
 
 
 class ClassificationMechanism(BaseMechanism):
-    def transform(self) -> MechanismResult:
-        # dimensions: x(number of classes), y(number of inputs) -> each input can have own dimension
-        self.inputs = {k: np.array(v).flatten() for k, v in self.inputs.items()}
-        results = np.full(
-            len(list(self.inputs.values())[0]), fill_value=-1, dtype=np.int32
-        )
-
+    def __init__(
+        self,
+        formulas: list[str],
+        inputs: dict[str, np.ndarray],
+        class_assignment: ClassAssignment = "strict",
+        chunk_size: int | None = None,
+        backend: MechanismBackend | None = None,
+        dtype: DTypeLike = np.float64,
+    ):
+        super().__init__(formulas, inputs, chunk_size, backend, dtype)
+        self.class_assignment = class_assignment
+
+    @staticmethod
+    def _assign_class(
+        results: NDArray[np.int32],
+        claimed: NDArray[np.bool_],
+        matches: NDArray[np.bool_],
+        class_idx: int,
+    ) -> bool:
+        """
+        first match wins: rows already claimed by an earlier class keep their id
+        returns False if the class overlaps with an earlier class
+        """
+        overlaps = bool(np.any(matches & claimed))
+        results[matches & ~claimed] = class_idx
+        claimed |= matches
+        return not overlaps
+
+    def _evaluate_class(
+        self, formula: str, values: dict[str, np.ndarray], nr_rows: int
+    ) -> NDArray[np.bool_]:
+        compiled = FORMULA_CACHE.get(formula, values.keys())
+        result: np.ndarray[Any, np.dtype[np.bool_]] = compiled(values)
+        assert result.dtype == np.bool_, "NOT A BOOL"
+        result = result.ravel()
+        assert result.shape == (nr_rows,), "INVALID SHAPE"
+        return result
+
+    def _all_elementwise(self) -> bool:
+        try:
+            return all(
+                FORMULA_CACHE.get(formula, self.values.keys()).elementwise
+                for formula in self.formulas
+            )
+        except SyntaxError:
+            return False
+
+    def _transform_strict(
+        self,
+        formulas: list[str],
+        values: dict[str, np.ndarray],
+        results: NDArray[np.int32],
+    ) -> list[int]:
+        claimed = np.zeros(len(results), dtype=np.bool_)
         failed_indices: list[int] = []
-        for idx, formula in enumerate(self.formulas):
-            tree = ast.parse(formula)
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Name) and node.id in self.inputs.keys():
-                    node.id = f'self.values["{node.id}"]'
-            new_formula = ast.unparse(tree)
+        for idx, formula in enumerate(formulas):
             try:
-                result: np.ndarray[Any, np.dtype[np.bool_]] = eval(new_formula)
-                assert result.dtype == np.bool_, "NOT A BOOL"
-                for idx_, x in enumerate(result):
-                    if bool(x) is True:
-                        if results[idx_] != -1:
-                            raise
-                        else:
-                            results[idx_] = idx
+                result = self._evaluate_class(formula, values, len(results))
             except:
                 failed_indices.append(idx)
+                continue
+
+            if not self._assign_class(results, claimed, result, idx):
+                failed_indices.append(idx)
+        return failed_indices
+
+    def _transform_first_match(
+        self,
+        formulas: list[str],
+        values: dict[str, np.ndarray],
+        results: NDArray[np.int32],
+    ) -> list[int]:
+        # indices of rows without a class, each formula only sees those rows
+        remaining = np.arange(len(results))
+        failed_indices: list[int] = []
+        for idx, formula in enumerate(formulas):
+            try:
+                compiled = FORMULA_CACHE.get(formula, values.keys())
+                if len(remaining) == len(results):
+                    result = self._evaluate_class(formula, values, len(results))
+                elif compiled.elementwise:
+                    # only the inputs of this formula, not every column
+                    subset = {
+                        name: values[name][remaining] for name in compiled.arg_names
+                    }
+                    result = self._evaluate_class(formula, subset, len(remaining))
+                else:
+                    # reductions (e.g. 'a.mean()') are taken over all rows
+                    result = self._evaluate_class(formula, values, len(results))
+                    result = result[remaining]
+            except Exception:
+                failed_indices.append(idx)
+                continue
+
+            results[remaining[result]] = idx
+            remaining = remaining[~result]
+        return failed_indices
+
+    def transform(self) -> MechanismResult:
+        # dimensions: x(number of classes), y(number of inputs) -> each input can have own dimension
+        self.values = {k: v.ravel() for k, v in self.values.items()}
+        nr_rows = self._nr_rows()
+        results = np.full(nr_rows, fill_value=-1, dtype=np.int32)
+
+        row_slices = self._row_slices(nr_rows)
+        if len(row_slices) > 1 and not self._all_elementwise():
+            row_slices = [slice(0, nr_rows)]
+
+        plan = plan_formulas(tuple(self.formulas), frozenset(self.values))
+
+        def kernel(rows: slice) -> list[int]:
+            # shared subexpressions are computed once for all classes
+            values = self._with_temporaries(self._slice_values(self.values, rows), plan)
+            formulas = list(plan.formulas)
+            # results[rows] is a view -> classes are written in place
+            match self.class_assignment:
+                case "strict":
+                    return self._transform_strict(formulas, values, results[rows])
+                case "first_match":
+                    return self._transform_first_match(formulas, values, results[rows])
+
+        failed = set()
+        for failed_in_rows in self.backend.map(kernel, row_slices):
+            failed.update(failed_in_rows)
+        failed_indices = sorted(failed)
 
         if len(failed_indices) > 0:
             return MechanismResult(
                 None, f"Failed to evaluate classes: {failed_indices}"
             )
 
-        else_class_idx = len(self.formulas)
-        for idx_, x in enumerate(results):
-            if x == -1:
-                results[idx_] = else_class_idx
+        # rows not claimed by any class -> 'else' class
+        results[results == -1] = len(self.formulas)
 
         return MechanismResult(results, None)
+
+
+# rows per block of the fused kernel, a few columns of this size fit in cache
+FUSED_CHUNK_SIZE = 2**14
+
+
+@dataclass(frozen=True)
+class FusedNode:
+    id_: str
+    mechanism_type: MechanismType
+    formulas: tuple[str, ...]
+    in_node_ids: tuple[str, ...]
+    class_assignment: ClassAssignment = "strict"
+
+
+def _fused_classes(
+    matches: tuple[Any, ...], class_assignment: ClassAssignment, nr_rows: int
+) -> NDArray[np.int32]:
+    """
+    Exception:
+        class is not a boolean or overlaps with an earlier class (strict)
+    """
+    results = np.full(nr_rows, fill_value=-1, dtype=np.int32)
+    claimed = np.zeros(nr_rows, dtype=np.bool_)
+    for idx, result in enumerate(matches):
+        if not isinstance(result, np.ndarray) or result.dtype != np.bool_:
+            raise Exception(f"Class {idx} is not a boolean")
+        overlaps = not ClassificationMechanism._assign_class(
+            results, claimed, result.ravel(), idx
+        )
+        if overlaps and class_assignment == "strict":
+            raise Exception(f"Class {idx} overlaps with an earlier class")
+    results[~claimed] = len(matches)
+    return results
+
+
+class _RenameTemporaries(ast.NodeTransformer):
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        if node.id.startswith(CSE_PREFIX):
+            node.id = f"{self.prefix}{node.id}"
+        return node
+
+
+@lru_cache(maxsize=32)
+def compile_fused_kernel(
+    nodes: tuple[FusedNode, ...]
+) -> Callable[[dict[str, np.ndarray], dict[str, np.ndarray], slice], None] | None:
+    """
+    generate one function that evaluates all nodes (in topological order) on a
+    block of rows, parents are read while they are still in cache:
+        def fused_kernel(_noise, _out, _rows):
+            n_a = _noise["a"][_rows]
+            _out["a"][_rows] = n_a
+            a = _out["a"][_rows]
+            n_b = _noise["b"][_rows]
+            _out["b"][_rows] = _fused_classes((a + n_b > 0,), "strict", ...)
+            b = _out["b"][_rows].astype(n_b.dtype)
+            ...
+    parameters are prefixed with '_', node ids cannot shadow them
+    returns None if a formula cannot be fused (not elementwise, unknown names)
+    """
+    lines = ["def fused_kernel(_noise, _out, _rows):"]
+    for node in nodes:
+        noise_name = f"n_{node.id_}"
+        input_names = frozenset([noise_name, *node.in_node_ids])
+        try:
+            trees = [ast.parse(formula, mode="eval") for formula in node.formulas]
+        except SyntaxError:
+            return None
+        if not all(
+            is_elementwise(tree) and _uses_only(tree, input_names) for tree in trees
+        ):
+            return None
+
+        # node ids are valid names -> unique prefix for shared subexpressions
+        rename = _RenameTemporaries(f"_{node.id_}")
+        plan = plan_formulas(node.formulas, input_names)
+        lines.append(f"    {noise_name} = _noise[{node.id_!r}][_rows]")
+        for name, expression in plan.temporaries:
+            tree = rename.visit(ast.parse(expression, mode="eval"))
+            lines.append(f"    _{node.id_}{name} = {ast.unparse(tree)}")
+        formulas = [
+            ast.unparse(rename.visit(ast.parse(formula, mode="eval")))
+            for formula in plan.formulas
+        ]
+        match node.mechanism_type:
+            case "regression":
+                value = formulas[0]
+            case "classification":
+                value = (
+                    f"_fused_classes(({', '.join(formulas)},), "
+                    f"{node.class_assignment!r}, len({noise_name}))"
+                )
+        lines.append(f"    _out[{node.id_!r}][_rows] = {value}")
+        # children see the stored column, same as in the node by node path:
+        # class labels are converted to the float dtype of the noise
+        column = f"_out[{node.id_!r}][_rows]"
+        if node.mechanism_type == "classification":
+            column = f"{column}.astype({noise_name}.dtype)"
+        lines.append(f"    {node.id_} = {column}")
+
+    namespace = dict(globals())
+    exec(compile("\n".join(lines), "<fused kernel>", "exec"), namespace)
+    return namespace["fused_kernel"]
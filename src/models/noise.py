@@ -1,17 +1,323 @@
+import os
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Any, Self
+from functools import lru_cache
+from typing import Any, Callable, Hashable, Literal, Self
 
 import numpy as np
 import scipy.stats as stats
+from numpy.typing import DTypeLike
+from scipy.special import ndtri
+from scipy.stats import qmc
 from scipy.stats import rv_continuous as RVCont
 from scipy.stats import rv_discrete as RVDisc
 
 
 class CONSTANTS:
     NR_DATA_POINTS: int = 3000
+    # root entropy of all random streams, see 'stream_seed'
+    SEED: int = 0
+    # points of the analytic density preview
+    DENSITY_GRID_SIZE: int = 512
 
 
-Generator = RVCont | RVDisc
+class EmpiricalTable:
+    """
+    discrete distribution over the values of a local .npy file, the file is
+    memory mapped and not copied:
+        1d array: measured samples, every value with the same weight
+        2d array (n, 2): value and weight columns, e.g. a custom pmf
+    sampling is O(1) per draw with an alias table (vose), built once
+    """
+
+    def __init__(self, source: str) -> None:
+        """
+        Exception:
+            cannot read the file or invalid table
+        """
+        try:
+            data = np.load(source, mmap_mode="r", allow_pickle=False)
+        except Exception as e:
+            raise Exception(f"Failed to load empirical table: {source}") from e
+        if data.ndim == 1:
+            values, weights = data, None
+        elif data.ndim == 2 and data.shape[1] == 2:
+            values, weights = data[:, 0], data[:, 1]
+        else:
+            raise Exception("Empirical table needs shape (n,) or (n, 2)")
+        if len(values) == 0:
+            raise Exception("Empirical table is empty")
+
+        self.source = source
+        self.values = values
+        self.alias: np.ndarray | None = None
+        self.acceptance: np.ndarray | None = None
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)
+            if not np.isfinite(weights).all() or (weights < 0).any():
+                raise Exception("Empirical weights need to be finite and >= 0")
+            if weights.sum() <= 0:
+                raise Exception("Empirical weights must not all be zero")
+            self.acceptance, self.alias = self._build_alias(weights)
+        self._weights = weights
+        self._cdf: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+
+    @staticmethod
+    def _build_alias(weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # vose: every column keeps 'acceptance' of its own value and is
+        # topped up with the value 'alias' of a column above the mean
+        nr_values = len(weights)
+        scaled = weights * (nr_values / weights.sum())
+        acceptance = np.ones(nr_values)
+        alias = np.arange(nr_values)
+        small = np.flatnonzero(scaled < 1.0).tolist()
+        large = np.flatnonzero(scaled >= 1.0).tolist()
+        while small and large:
+            less, more = small.pop(), large[-1]
+            acceptance[less] = scaled[less]
+            alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            if scaled[more] < 1.0:
+                small.append(large.pop())
+        return acceptance, alias
+
+    def __deepcopy__(self, memo: dict) -> "EmpiricalTable":
+        # immutable, the memory map is shared
+        return self
+
+    def sample_indices(self, rng: np.random.Generator, size: Any) -> np.ndarray:
+        indices = rng.integers(0, len(self.values), size)
+        if self.acceptance is None or self.alias is None:
+            return indices
+        rejected = rng.random(size) >= self.acceptance[indices]
+        indices[rejected] = self.alias[indices[rejected]]
+        return indices
+
+    def rvs(
+        self, size: Any = 1, random_state: np.random.Generator | None = None
+    ) -> np.ndarray:
+        rng = np.random.default_rng(random_state)
+        return np.asarray(self.values[self.sample_indices(rng, size)])
+
+    def _distribution(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # sorted support with probabilities and cdf, for pmf/ppf (previews)
+        if self._cdf is None:
+            support, inverse = np.unique(np.asarray(self.values), return_inverse=True)
+            weights = (
+                np.ones(len(self.values)) if self._weights is None else self._weights
+            )
+            probabilities = np.bincount(inverse, weights=weights) / weights.sum()
+            self._cdf = (support, probabilities, np.cumsum(probabilities))
+        return self._cdf
+
+    def support(self) -> np.ndarray:
+        return self._distribution()[0]
+
+    def pmf(self, x: Any) -> np.ndarray:
+        support, probabilities, _ = self._distribution()
+        x = np.asarray(x, dtype=np.float64)
+        index = np.minimum(np.searchsorted(support, x), len(support) - 1)
+        return np.where(support[index] == x, probabilities[index], 0.0)
+
+    def ppf(self, q: Any) -> np.ndarray:
+        support, _, cdf = self._distribution()
+        index = np.searchsorted(cdf, q, side="left")
+        return support[np.minimum(index, len(support) - 1)]
+
+
+@lru_cache(maxsize=16)
+def _load_empirical_table(source: str, modified: int, file_size: int) -> EmpiricalTable:
+    return EmpiricalTable(source)
+
+
+def load_empirical_table(source: str) -> EmpiricalTable:
+    """
+    cached by path and modification, a changed file is loaded again
+    Exception:
+        cannot read the file or invalid table
+    """
+    try:
+        stat = os.stat(source)
+    except OSError as e:
+        raise Exception(f"Failed to load empirical table: {source}") from e
+    return _load_empirical_table(
+        os.path.realpath(source), stat.st_mtime_ns, stat.st_size
+    )
+
+
+Generator = RVCont | RVDisc | EmpiricalTable
+# (rng, current parameter values, output slice) -> fills the slice in place
+Sampler = Callable[[np.random.Generator, dict[str, float], np.ndarray], None]
+
+
+def _standard(method: Callable[..., np.ndarray], out: np.ndarray) -> np.ndarray:
+    # float64 draws go directly into 'out', other types are drawn in float64
+    # and cast, so the values of a stream do not depend on the dtype
+    if out.dtype == np.float64 and out.flags.c_contiguous:
+        return method(out=out)
+    out[...] = method(size=out.shape)
+    return out
+
+
+def _sample_normal(
+    rng: np.random.Generator, p: dict[str, float], out: np.ndarray
+) -> None:
+    _standard(rng.standard_normal, out)
+    out *= p["scale"]
+    out += p["loc"]
+
+
+def _sample_lognorm(
+    rng: np.random.Generator, p: dict[str, float], out: np.ndarray
+) -> None:
+    # scipy: loc + scale * exp(s * z)
+    _standard(rng.standard_normal, out)
+    out *= p["s"]
+    np.exp(out, out=out)
+    out *= p["scale"]
+    out += p["loc"]
+
+
+def _sample_uniform(
+    rng: np.random.Generator, p: dict[str, float], out: np.ndarray
+) -> None:
+    _standard(rng.random, out)
+    out *= p["scale"]
+    out += p["loc"]
+
+
+# numpy implementations of the scipy parametrizations, skip the argument
+# checking and dispatch of 'rvs', which dominates small (preview) samples
+# samplers without an 'out' argument in numpy need one temporary per slice
+NATIVE_SAMPLERS: dict[str, Sampler] = {
+    "normal": _sample_normal,
+    "lognorm": _sample_lognorm,
+    "uniform": _sample_uniform,
+    "laplace": lambda rng, p, out: out.__setitem__(
+        ..., rng.laplace(p["loc"], p["scale"], out.shape)
+    ),
+    "poisson": lambda rng, p, out: out.__setitem__(
+        ..., rng.poisson(p["mu"], out.shape)
+    ),
+    "binom": lambda rng, p, out: out.__setitem__(
+        ..., rng.binomial(int(p["n"]), p["p"], out.shape)
+    ),
+    "bernoulli": lambda rng, p, out: out.__setitem__(
+        ..., rng.binomial(1, p["p"], out.shape)
+    ),
+    # scipy: [low, high - 1]
+    "randint": lambda rng, p, out: out.__setitem__(
+        ..., rng.integers(int(p["low"]), int(p["high"]), out.shape)
+    ),
+}
+
+
+# (base draws, current parameter values, output slice) -> fills the slice
+Transform = Callable[[np.ndarray, dict[str, float], np.ndarray], None]
+BaseKind = Literal["uniform", "normal"]
+
+
+def _transform_loc_scale(
+    base: np.ndarray, p: dict[str, float], out: np.ndarray
+) -> None:
+    np.multiply(base, p["scale"], out=out)
+    out += p["loc"]
+
+
+def _transform_lognorm(z: np.ndarray, p: dict[str, float], out: np.ndarray) -> None:
+    np.multiply(z, p["s"], out=out)
+    np.exp(out, out=out)
+    out *= p["scale"]
+    out += p["loc"]
+
+
+def _transform_laplace(u: np.ndarray, p: dict[str, float], out: np.ndarray) -> None:
+    # inverse cdf: loc - scale * sign(u - 0.5) * log(1 - 2 * |u - 0.5|)
+    centered = u - 0.5
+    np.abs(centered, out=out)
+    out *= -2.0
+    np.log1p(out, out=out)
+    out *= -p["scale"]
+    np.copysign(out, centered, out=out)
+    out += p["loc"]
+
+
+# inverse cdf (or loc/scale shift) of cached base draws, for common random
+# numbers: a parameter change moves the same draws instead of new ones
+# everything else with a 'ppf' goes through scipy on uniform base draws
+NATIVE_TRANSFORMS: dict[str, tuple[BaseKind, Transform]] = {
+    "normal": ("normal", _transform_loc_scale),
+    "lognorm": ("normal", _transform_lognorm),
+    "uniform": ("uniform", _transform_loc_scale),
+    "laplace": ("uniform", _transform_laplace),
+}
+
+
+# pseudo: independent draws, sobol/halton: scrambled low discrepancy
+# sequences, lhs: one draw per stratum [k/n, (k+1)/n), antithetic: u and 1 - u
+SamplingMode = Literal["pseudo", "sobol", "halton", "lhs", "antithetic"]
+SAMPLING_MODES: list[SamplingMode] = ["pseudo", "sobol", "halton", "lhs", "antithetic"]
+
+
+def base_uniforms(
+    rng: np.random.Generator, size: int, sampling: SamplingMode = "pseudo"
+) -> np.ndarray:
+    """
+    uniform draws in the open interval (0, 1), finite for every inverse cdf
+    the order of the draws is random for every sampling mode
+    Exception:
+        unknown sampling mode
+    """
+    match sampling:
+        case "pseudo":
+            return (rng.integers(0, 2**53, size) + 0.5) / 2**53
+        case "sobol":
+            # balanced for powers of two, the first 'size' points otherwise
+            nr_bits = max(0, int(np.ceil(np.log2(max(size, 1)))))
+            uniforms = qmc.Sobol(1, seed=rng).random_base2(nr_bits)[:size, 0]
+        case "halton":
+            uniforms = qmc.Halton(1, seed=rng).random(size)[:, 0]
+        case "lhs":
+            uniforms = (rng.permutation(size) + rng.random(size)) / size
+        case "antithetic":
+            half = (rng.integers(0, 2**53, (size + 1) // 2) + 0.5) / 2**53
+            uniforms = np.concatenate([half, 1.0 - half[: size // 2]])
+        case _:
+            raise Exception("Unknown sampling mode")
+    rng.shuffle(uniforms)
+    return np.clip(uniforms, 0.5 / 2**53, 1.0 - 0.5 / 2**53)
+
+
+def allocate_rows(weights: list[float], total: int) -> list[int]:
+    """
+    split 'total' rows proportional to 'weights' (largest remainder method),
+    ties go to the first weights, equal weights -> sizes differ by at most one
+    Exception:
+        negative weights or all weights zero
+    """
+    if any(weight < 0 for weight in weights) or sum(weights) <= 0:
+        raise Exception("Invalid mixture weights")
+    shares = [weight * total / sum(weights) for weight in weights]
+    rows = [int(share) for share in shares]
+    by_remainder = sorted(range(len(weights)), key=lambda idx: rows[idx] - shares[idx])
+    for idx in by_remainder[: total - sum(rows)]:
+        rows[idx] += 1
+    return rows
+
+
+def stream_seed(
+    id_: str, root: int | None = None, *sub_keys: int
+) -> np.random.SeedSequence:
+    """
+    independent seed sequence of the random stream named 'id_' (e.g. a node id)
+    the spawn key only depends on the name and not on the creation order,
+    so a stream can be reproduced from the root seed alone and streams can
+    be drawn in parallel threads without sharing global state
+    sub_keys: further split the stream, e.g. per sub distribution
+    """
+    root = CONSTANTS.SEED if root is None else root
+    return np.random.SeedSequence(root, spawn_key=(*id_.encode("utf-8"), *sub_keys))
 
 
 @dataclass(kw_only=True)
@@ -46,6 +352,10 @@ class Distribution:
     # dependant on the type, 'parameters' & 'generator' do different things
     parameters: dict[str, Parameter]
     generator: Generator
+    # relative share of the rows within the noise mixture
+    weight: float = 1.0
+    # file of an 'empirical' distribution
+    source: str | None = None
 
     @staticmethod
     def parameter_options() -> list[str]:
@@ -239,8 +549,27 @@ class Distribution:
             case _:
                 return None
 
-    def change_distribution(self, name: str) -> None:
-        new_distribution = Distribution.get_distribution(self.id_, name)
+    @classmethod
+    def empirical(cls, id: str, source: str) -> Self:
+        """
+        distribution of the values in a .npy file, see 'EmpiricalTable'
+        Exception:
+            cannot read the file or invalid table
+        """
+        return cls(id, "empirical", {}, load_empirical_table(source), source=source)
+
+    def change_distribution(self, name: str, source: str | None = None) -> None:
+        """
+        source: .npy file of an 'empirical' distribution
+        Exception:
+            unknown distribution or invalid source
+        """
+        if name == "empirical":
+            source = self.source if source is None else source
+        if name == "empirical" and source is not None:
+            new_distribution = Distribution.empirical(self.id_, source)
+        else:
+            new_distribution = Distribution.get_distribution(self.id_, name)
         if new_distribution is None:
             raise Exception("Unknown distribution")
 
@@ -248,6 +577,117 @@ class Distribution:
         self.name = new_distribution.name
         self.parameters = new_distribution.parameters
         self.generator = new_distribution.generator
+        self.source = new_distribution.source
+
+    def source_version(self) -> tuple[int, int] | None:
+        """
+        modification time and size of the source file, None without one
+        Exception:
+            cannot read the file
+        """
+        if self.source is None:
+            return None
+        try:
+            stat = os.stat(self.source)
+        except OSError as e:
+            raise Exception(f"Failed to load empirical table: {self.source}") from e
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload_source(self) -> None:
+        """
+        load the source file again if it changed since it was read
+        Exception:
+            cannot read the file or invalid table
+        """
+        if self.source is not None:
+            self.generator = load_empirical_table(self.source)
+
+    def get_parameter_values(self) -> dict[str, float]:
+        return {v.name: v.current for v in self.parameters.values()}
+
+    def change_weight(self, new_value: float) -> None:
+        self.weight = max(0.0, new_value)
+
+    def sample(
+        self, rng: np.random.Generator, size: int, native: bool = True
+    ) -> np.ndarray:
+        """
+        draw 'size' samples with the current parameters
+        native: use the numpy sampler if available, scipy is the fallback
+        """
+        out = np.empty(size)
+        self.sample_into(rng, out, native)
+        return out
+
+    def sample_into(
+        self, rng: np.random.Generator, out: np.ndarray, native: bool = True
+    ) -> None:
+        """
+        fill 'out' in place with samples, see 'sample'
+        """
+        parameter_values = self.get_parameter_values()
+        sampler = NATIVE_SAMPLERS.get(self.name) if native else None
+        if sampler is None:
+            out[...] = self.generator.rvs(
+                **parameter_values, size=out.shape, random_state=rng
+            )
+        else:
+            sampler(rng, parameter_values, out)
+
+    def is_discrete(self) -> bool:
+        return isinstance(self.generator, (RVDisc, EmpiricalTable))
+
+    def discrete_support(self, tail: float) -> np.ndarray:
+        """
+        points with probability mass between the 'tail' quantiles
+        """
+        if isinstance(self.generator, EmpiricalTable):
+            support = self.generator.support()
+            return support[
+                (support >= self.quantile(tail))
+                & (support <= self.quantile(1.0 - tail))
+            ]
+        low, high = self.quantile(tail), self.quantile(1.0 - tail)
+        if not np.isfinite(low) or not np.isfinite(high):
+            return np.empty(0)
+        return np.arange(np.floor(low), np.ceil(high) + 1)
+
+    def quantile(self, q: float) -> float:
+        return float(self.generator.ppf(q, **self.get_parameter_values()))
+
+    def density(self, x: np.ndarray) -> np.ndarray:
+        """
+        pdf, or pmf for discrete distributions, at 'x' with the current
+        parameters, zero where undefined (e.g. scale 0)
+        """
+        parameter_values = self.get_parameter_values()
+        if self.is_discrete():
+            values = self.generator.pmf(x, **parameter_values)
+        else:
+            values = self.generator.pdf(x, **parameter_values)
+        return np.nan_to_num(values, nan=0.0, posinf=0.0)
+
+    def base_kind(self) -> BaseKind | None:
+        """
+        base draws needed by 'transform_into', None -> no inverse cdf
+        """
+        if self.name in NATIVE_TRANSFORMS:
+            return NATIVE_TRANSFORMS[self.name][0]
+        return "uniform" if hasattr(self.generator, "ppf") else None
+
+    def transform_into(self, base: np.ndarray, out: np.ndarray) -> None:
+        """
+        fill 'out' in place by transforming the base draws of 'base_kind'
+        Exception:
+            no inverse cdf
+        """
+        parameter_values = self.get_parameter_values()
+        if self.name in NATIVE_TRANSFORMS:
+            NATIVE_TRANSFORMS[self.name][1](base, parameter_values, out)
+        elif hasattr(self.generator, "ppf"):
+            out[...] = self.generator.ppf(base, **parameter_values)
+        else:
+            raise Exception("No inverse cdf")
 
     def get_parameter_names(self) -> list[str]:
         return list(self.parameters.keys())
@@ -258,6 +698,20 @@ class Distribution:
         return self.parameters.get(name)
 
 
+@dataclass
+class DensityPreview:
+    """
+    mixture density of a noise without sampling: the continuous sub
+    distributions on a grid, the discrete ones on their integer support
+    both parts are weighted by the share of rows of their sub distribution
+    """
+
+    x: np.ndarray
+    pdf: np.ndarray
+    support: np.ndarray
+    pmf: np.ndarray
+
+
 @dataclass
 class Noise:
     id_: str
@@ -266,6 +720,27 @@ class Noise:
             str(nr): None for nr in range(10)
         }  # sub variables e.g. a_0, a_1
     )
+    # shuffle the rows, otherwise the samples are ordered by sub distribution
+    shuffle: bool = False
+    # common random numbers: keep the base draws of every sub distribution and
+    # only transform them on parameter changes (inverse cdf), so the samples
+    # move smoothly instead of being drawn again
+    common_random_numbers: bool = False
+    # how the base draws are spread, everything but 'pseudo' transforms
+    # uniforms through the inverse cdf, see 'base_uniforms'
+    sampling: SamplingMode = "pseudo"
+    _base_draws: dict[Hashable, np.ndarray] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    # last unshuffled mixture of an incremental 'generate_data', with the
+    # layout it was drawn for and a version (state key) per sub distribution
+    _last_mixture: tuple[Hashable, dict[str, Hashable], np.ndarray] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # sub distribution ids drawn by the last incremental 'generate_data'
+    last_resampled: list[str] = field(
+        default_factory=list, init=False, repr=False, compare=False
+    )
 
     @classmethod
     def default_noise(cls, id_: str) -> Self:
@@ -313,20 +788,288 @@ class Noise:
             raise Exception("Cannot remove this distribution")
         self.sub_distributions[to_remove.id_] = None
 
-    def generate_data(self) -> np.ndarray[Any, np.dtype[np.float64]]:
+    def sample_key(
+        self,
+        seed_sequence: np.random.SeedSequence | None = None,
+        dtype: DTypeLike = np.float64,
+        sampling: SamplingMode | None = None,
+        nr_points: int | None = None,
+    ) -> Hashable:
+        """
+        everything 'generate_data' depends on: distributions with their
+        parameters, weights and source files, seed, number of points, dtype,
+        sampling mode and shuffling
+        """
+        if seed_sequence is None:
+            seed_sequence = stream_seed(self.id_)
+        return (
+            tuple(
+                (
+                    distribution.id_,
+                    distribution.name,
+                    distribution.weight,
+                    distribution.source,
+                    distribution.source_version(),
+                    tuple(distribution.get_parameter_values().items()),
+                )
+                for distribution in self.get_distributions()
+            ),
+            str(seed_sequence.entropy),
+            seed_sequence.spawn_key,
+            CONSTANTS.NR_DATA_POINTS if nr_points is None else nr_points,
+            np.dtype(dtype).str,
+            self.shuffle,
+            self.common_random_numbers,
+            self.sampling if sampling is None else sampling,
+        )
+
+    def density_preview(
+        self, grid_size: int | None = None, tail: float = 1e-3
+    ) -> DensityPreview:
+        """
+        evaluate the mixture pdf/pmf analytically, the cost depends on the
+        grid size and not on the number of samples
+        tail: probability cut off on each side of every sub distribution
+        """
+        if grid_size is None:
+            grid_size = CONSTANTS.DENSITY_GRID_SIZE
+        distributions = self.get_distributions()
+        weights = np.array([distribution.weight for distribution in distributions])
+        if weights.sum() <= 0:
+            raise Exception("Invalid mixture weights")
+        weights = weights / weights.sum()
+
+        continuous = [d for d in distributions if not d.is_discrete()]
+        discrete = [d for d in distributions if d.is_discrete()]
+
+        def bounds(parts: list[Distribution]) -> tuple[float, float]:
+            low = min(part.quantile(tail) for part in parts)
+            high = max(part.quantile(1.0 - tail) for part in parts)
+            if not np.isfinite(low) or not np.isfinite(high) or low >= high:
+                # degenerate (e.g. scale 0), show some room around it
+                center = float(np.nan_to_num(low))
+                return center - 1.0, center + 1.0
+            return low, high
+
+        x = np.linspace(*bounds(continuous), grid_size) if continuous else np.empty(0)
+        pdf = np.zeros_like(x)
+        support = np.unique(
+            np.concatenate([np.empty(0)] + [d.discrete_support(tail) for d in discrete])
+        )
+        pmf = np.zeros_like(support)
+        for distribution, weight in zip(distributions, weights):
+            if distribution.is_discrete():
+                pmf += weight * distribution.density(support)
+            else:
+                pdf += weight * distribution.density(x)
+        return DensityPreview(x, pdf, support, pmf)
+
+    def _get_base_draws(
+        self,
+        rng: np.random.Generator,
+        key: Hashable,
+        size: int,
+        kind: BaseKind,
+        sampling: SamplingMode,
+    ) -> np.ndarray:
+        # standard normals are derived from the uniforms of the same stream
+        # only kept for common random numbers
+        keep = self.common_random_numbers
+        uniforms = self._base_draws.get((key, size, "uniform"))
+        if uniforms is None:
+            uniforms = base_uniforms(rng, size, sampling)
+            if keep:
+                self._base_draws[(key, size, "uniform")] = uniforms
+        if kind == "uniform":
+            return uniforms
+        normals = self._base_draws.get((key, size, "normal"))
+        if normals is None:
+            normals = ndtri(uniforms)
+            if keep:
+                self._base_draws[(key, size, "normal")] = normals
+        return normals
+
+    def generate_data(
+        self,
+        seed_sequence: np.random.SeedSequence | None = None,
+        dtype: DTypeLike = np.float64,
+        incremental: bool = False,
+        sampling: SamplingMode | None = None,
+        nr_points: int | None = None,
+    ) -> np.ndarray[Any, np.dtype[np.floating]]:
+        """
+        seed_sequence: stream of this noise, None -> 'stream_seed' of its id
+        every sub distribution draws from its own child stream
+        dtype: float type of the samples, e.g. np.float32 to halve the memory
+        incremental: remember the mixture and on the next call only redraw the
+        sub distributions that changed, the other slices are copied over
+        the values are the same as without 'incremental', but read-only
+        unless shuffled
+        with 'common_random_numbers' the sub distributions with an inverse cdf
+        transform their cached base draws, the others are sampled as usual
+        sampling: overrides the sampling mode of this noise, quasi random and
+        stratified modes need several times fewer points for the same accuracy
+        nr_points: number of samples, None -> 'CONSTANTS.NR_DATA_POINTS'
+        """
+        if seed_sequence is None:
+            seed_sequence = stream_seed(self.id_)
+        if sampling is None:
+            sampling = self.sampling
+        if nr_points is None:
+            nr_points = CONSTANTS.NR_DATA_POINTS
+
+        def child_rng(key: int) -> np.random.Generator:
+            return np.random.default_rng(
+                np.random.SeedSequence(
+                    seed_sequence.entropy,
+                    spawn_key=(*seed_sequence.spawn_key, key),
+                )
+            )
+
         distributions = self.get_distributions()
-        partition, rest = divmod(CONSTANTS.NR_DATA_POINTS, len(distributions))
-        x = [partition for _ in range(len(distributions))]
-        y = [1 if idx < rest else 0 for idx, _ in enumerate(range(len(distributions)))]
-        buckets = [a + b for a, b in zip(x, y)]
-        values: list[float] = []
-        for distribution, nr_points in zip(distributions, buckets):
-            parameter_values = {
-                v.name: v.current for v in distribution.parameters.values()
+        for distribution in distributions:
+            distribution.reload_source()
+        buckets = allocate_rows(
+            [distribution.weight for distribution in distributions], nr_points
+        )
+        # same layout -> every sub distribution keeps its slice of the mixture
+        layout = (
+            str(seed_sequence.entropy),
+            seed_sequence.spawn_key,
+            np.dtype(dtype).str,
+            tuple(zip([d.id_ for d in distributions], buckets)),
+            self.common_random_numbers,
+            sampling,
+        )
+        versions = {
+            distribution.id_: (
+                distribution.name,
+                distribution.source,
+                distribution.source_version(),
+                tuple(distribution.get_parameter_values().items()),
+            )
+            for distribution in distributions
+        }
+        last = self._last_mixture if incremental else None
+        if last is not None and last[0] == layout:
+            # copy on write, the previous mixture may be shared (e.g. cached)
+            values = last[2].copy()
+            last_versions = last[1]
+        else:
+            # one allocation, every sub distribution fills its own slice
+            values = np.empty(nr_points, dtype=dtype)
+            last_versions = {}
+
+        resampled: list[str] = []
+        base_draws_used: set[Hashable] = set()
+        start = 0
+        for distribution, size in zip(distributions, buckets):
+            # base draws + inverse cdf, sampled directly if there is none
+            transformed = self.common_random_numbers or sampling != "pseudo"
+            kind = distribution.base_kind() if transformed else None
+            base_key = (layout[0], layout[1], distribution.id_, sampling)
+            if kind is not None:
+                base_draws_used.update((base_key, size, k) for k in ["uniform", kind])
+            if last_versions.get(distribution.id_) == versions[distribution.id_]:
+                start += size
+                continue
+
+            # child stream keyed by the sub distribution id, independent of
+            # which other sub distributions exist
+            rng = child_rng(int(distribution.id_))
+            out = values[start : start + size]
+            if kind is not None:
+                base = self._get_base_draws(rng, base_key, size, kind, sampling)
+                distribution.transform_into(base, out)
+            else:
+                distribution.sample_into(rng, out)
+            resampled.append(distribution.id_)
+            start += size
+
+        if self.common_random_numbers:
+            # drop base draws of removed or resized sub distributions
+            self._base_draws = {
+                k: v for k, v in self._base_draws.items() if k in base_draws_used
+            }
+
+        if incremental:
+            # kept for the next call, so the caller must not modify it
+            values.setflags(write=False)
+            self._last_mixture = (layout, versions, values)
+            self.last_resampled = resampled
+            values = values.copy() if self.shuffle else values
+        if self.shuffle:
+            # key after all possible sub distribution ids
+            child_rng(len(self.sub_distributions)).shuffle(values)
+        return values
+
+
+class SampleCache:
+    """
+    bounded LRU cache of generated noise, keyed by 'Noise.sample_key'
+    the cached arrays are shared and therefore read-only
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2**20) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        # dash callbacks may run in several threads
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        noise: Noise,
+        seed_sequence: np.random.SeedSequence | None = None,
+        dtype: DTypeLike = np.float64,
+    ) -> np.ndarray[Any, np.dtype[np.floating]]:
+        key = noise.sample_key(seed_sequence, dtype)
+        with self._lock:
+            values = self._entries.get(key)
+            if values is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return values
+            self.misses += 1
+
+        # sampling outside of the lock, a concurrent miss only costs time
+        values = noise.generate_data(seed_sequence, dtype, incremental=True)
+        values.setflags(write=False)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = values
+                self.nbytes += values.nbytes
+            # the newest entry stays even if it alone exceeds the budget
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return values
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "nbytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
             }
-            # TODO: setting for seed via UI?
-            np.random.seed(0)
-            new_values = distribution.generator.rvs(**parameter_values, size=nr_points)
-            values.append(new_values)
 
-        return np.array(values).flatten()
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+# noise previews in the ui, repeated slider positions are not sampled again
+PREVIEW_CACHE = SampleCache()
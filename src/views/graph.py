@@ -38,12 +38,14 @@ class NodeBuilder(html.Div):
         in_nodes = source_node.get_in_node_ids()
         out_nodes = source_node.get_out_node_ids()
 
+        # one reachability query for all targets
+        addable = graph.get_addable_targets(source_node)
         can_add = []
         for other_node_id in graph.get_node_ids():
             target_node = graph.get_node_by_id(other_node_id)
             if target_node is None:
                 continue
-            if graph.can_add_edge(source_node, target_node):
+            if other_node_id in addable:
                 can_add.append(
                     {
                         "label": target_node.id_,
@@ -34,6 +34,11 @@ class MechanismContainer(html.Div):
                 value=node.mechanism_metadata.mechanism_type,
                 id={"type": "mechanism-choice", "index": id_},
             ),
+            RadioItems(
+                {"numpy": "single thread", "threaded": "multi threaded"},
+                value=node.mechanism_metadata.backend,
+                id={"type": "mechanism-backend-choice", "index": id_},
+            ),
             html.Hr(),
             html.P(f"Causes: {', '.join(causes)}"),
             MechanismInput(id_),
@@ -98,6 +103,14 @@ class ClassificationBuilder(html.Div):
         if node is None:
             raise Exception("Node not found")
 
+        self.children.append(
+            RadioItems(
+                ["strict", "first_match"],
+                value=node.mechanism_metadata.class_assignment,
+                id={"type": "class-assignment-choice", "index": id_},
+            )
+        )
+
         for c, f in node.mechanism_metadata.get_formulas().items():
             self.children.extend(
                 [
@@ -136,17 +149,24 @@ class MechanismViewer(html.Div):
             in_node_ids = [in_node_id for in_node_id in node.get_in_node_ids()]
             in_node_ids.append(f"n_{node_id}")
             mechanism_metadata = node.mechanism_metadata
+            # what will actually be evaluated after constant folding etc.
+            optimized = mechanism_metadata.get_optimized_formulas(in_node_ids)
             if mechanism_metadata.mechanism_type == "regression":
                 # one formula
                 # TODO: getting formulas can be None -> proper getter + check
                 formula = list(mechanism_metadata.formulas.values())[0]
                 assert formula is not None
+                is_optimized = optimized["0"] != formula
                 formula = f"{node_id} = f_{node_id}({', '.join(in_node_ids)}) = {formula}"
                 self.children.append(html.P(formula))
+                if is_optimized:
+                    self.children.append(html.P(f"evaluated as: {optimized['0']}"))
             else:
                 # multiple formulas
-                formulas = list(mechanism_metadata.formulas.values())
-                for formula in formulas:
-                    if formula is not None:
-                        self.children.append(html.P(formula))
+                for class_id, formula in mechanism_metadata.get_formulas().items():
+                    self.children.append(html.P(formula))
+                    if optimized[class_id] != formula:
+                        self.children.append(
+                            html.P(f"evaluated as: {optimized[class_id]}")
+                        )
             self.children.append(html.Hr())
@@ -1,10 +1,12 @@
 import dash_bootstrap_components as dbc
-import plotly.figure_factory as ff
+import numpy as np
+import plotly.graph_objects as go
 from dash import html
-from dash.dcc import Dropdown, Graph, Input, Slider
+from dash.dcc import Dropdown, Graph, Input, RadioItems, Slider
 
 from models.graph import graph
-from models.noise import Distribution
+from models.noise import PREVIEW_CACHE, SAMPLING_MODES, Distribution
+from utils.density import binned_kde
 
 
 class NoiseBuilder(html.Div):
@@ -27,7 +29,19 @@ class NoiseContainer(html.Div):
         if node is None:
             raise Exception("Node not found")
 
-        self.children = []
+        self.children = [
+            RadioItems(
+                {"fresh": "new samples", "common": "common random numbers"},
+                value="common" if node.noise.common_random_numbers else "fresh",
+                id={"type": "noise-sampling-choice", "index": id_},
+            ),
+            Dropdown(
+                options=SAMPLING_MODES,
+                value=node.noise.sampling,
+                clearable=False,
+                id={"type": "noise-sampling-mode", "index": id_},
+            ),
+        ]
         accordion = dbc.Accordion(start_collapsed=True)
         accordion.children = []
         for distribution in node.noise.get_distributions():
@@ -54,7 +68,12 @@ class NoiseContainer(html.Div):
 
 
 class NoiseNodeBuilder(html.Div):
-    def __init__(self, id_: tuple[str, str]):
+    def __init__(self, id_: tuple[str, str], choice: str | None = None):
+        """
+        choice: distribution shown in the dropdown, defaults to the current one
+        'empirical' shows the source controls, the distribution only changes
+        once a source is loaded
+        """
         new_id_ = f"{id_[0]}_{id_[1]}"
         super().__init__(id={"type": "noise-node-builder", "index": new_id_})
         source_node = graph.get_node_by_id(id_[0])
@@ -65,18 +84,45 @@ class NoiseNodeBuilder(html.Div):
         if distribution is None:
             raise Exception("No parameters found")
 
+        if choice is None:
+            choice = distribution.name
+
         col = dbc.Col()
         col.children = []
         parmeter_options = Distribution.parameter_options()
+        parmeter_options.append("empirical")
         col.children.append(
             Dropdown(
                 options=parmeter_options,
-                value=distribution.name,
+                value=choice,
                 id={"type": "distribution-choice", "index": new_id_},
             )
         )
+        if choice == "empirical":
+            col.children.append(
+                dbc.Row(
+                    [
+                        dbc.Col(
+                            Input(
+                                id={"type": "empirical-source", "index": new_id_},
+                                value=distribution.source,
+                                type="text",
+                                placeholder="empirical values (.npy)",
+                            )
+                        ),
+                        dbc.Col(
+                            html.Button(
+                                "Load",
+                                id={"type": "load-empirical", "index": new_id_},
+                            )
+                        ),
+                    ]
+                )
+            )
         col.children.append(html.Hr())
-        for param in distribution.parameters.values():
+        # parameters of the chosen distribution only, not of the previous one
+        parameters = distribution.parameters if choice == distribution.name else {}
+        for param in parameters.values():
             col.children.append(
                 dbc.Col(
                     [
@@ -178,6 +224,14 @@ class NoiseNodeBuilder(html.Div):
 class NoiseViewer(html.Div):
     # TODO: hardcoded 'a' since initially defined
     SELECTED_NODE_ID: str = "a"
+    # density: analytic pdf/pmf, samples: histogram + kde, both: overlay
+    PREVIEW_MODE: str = "density"
+    PREVIEW_MODES: dict[str, str] = {
+        "density": "density",
+        "samples": "samples",
+        "both": "density + samples",
+    }
+
     def __init__(self):
         super().__init__(id="noise-viewer")
 
@@ -188,9 +242,35 @@ class NoiseViewer(html.Div):
         noise = source_node.noise
         param = noise.id_
 
-        figure = ff.create_distplot(
-            [noise.generate_data()], [param], show_rug=False, bin_size=0.2
-        )
+        figure = go.Figure()
+        if NoiseViewer.PREVIEW_MODE in ["samples", "both"]:
+            samples = binned_kde(
+                PREVIEW_CACHE.get(noise, graph.noise_seed(source_node))
+            )
+            figure.add_trace(
+                go.Bar(
+                    x=(samples.edges[:-1] + samples.edges[1:]) / 2,
+                    y=samples.histogram,
+                    width=np.diff(samples.edges),
+                    opacity=0.4,
+                    name="samples",
+                )
+            )
+            if NoiseViewer.PREVIEW_MODE == "samples":
+                figure.add_trace(
+                    go.Scatter(x=samples.grid, y=samples.kde, mode="lines", name=param)
+                )
+        if NoiseViewer.PREVIEW_MODE in ["density", "both"]:
+            # no sampling needed, cost depends on the grid size
+            density = noise.density_preview()
+            if len(density.x) > 0:
+                figure.add_trace(
+                    go.Scatter(x=density.x, y=density.pdf, mode="lines", name="pdf")
+                )
+            if len(density.support) > 0:
+                figure.add_trace(
+                    go.Bar(x=density.support, y=density.pmf, name="pmf", width=0.2)
+                )
         self.children = [
             Dropdown(
                 options=graph.get_node_ids(),
@@ -198,6 +278,12 @@ class NoiseViewer(html.Div):
                 id="noise-viewer-target",
                 multi=False,
             ),
+            RadioItems(
+                NoiseViewer.PREVIEW_MODES,
+                value=NoiseViewer.PREVIEW_MODE,
+                inline=True,
+                id="noise-viewer-mode",
+            ),
             html.H3(f"variable: {param}"),
             Graph("graph-0", figure=figure)
         ]
@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+import numpy as np
+import numpy.testing as npt
+import scipy.stats as stats
+
+from utils.density import binned_kde, silverman_bandwidth
+
+
+class BinnedDensityTest(TestCase):
+    def test_binned_kde(self):
+        samples = np.random.default_rng(0).normal(size=100_000)
+        density = binned_kde(samples, grid_size=256, nr_bins=32)
+        self.assertEqual(density.grid.shape, (256,))
+        self.assertEqual(density.edges.shape, (33,))
+        self.assertEqual(density.histogram.shape, (32,))
+        self.assertAlmostEqual(np.trapz(density.kde, density.grid), 1.0, delta=1e-3)
+        self.assertAlmostEqual(np.sum(density.histogram * np.diff(density.edges)), 1.0)
+        self.assertLess(
+            np.max(np.abs(density.kde - stats.norm.pdf(density.grid))), 0.02
+        )
+
+        # same as the direct kde, which costs samples x grid points
+        samples = samples[:2000]
+        density = binned_kde(samples, grid_size=1024)
+        expected = stats.gaussian_kde(
+            samples, bw_method=density.bandwidth / samples.std(ddof=1)
+        )
+        npt.assert_allclose(density.kde, expected(density.grid), atol=2e-3)
+
+    def test_bandwidth(self):
+        samples = np.random.default_rng(0).normal(size=10_000)
+        self.assertAlmostEqual(
+            silverman_bandwidth(samples), 0.9 * 10_000**-0.2, delta=0.01
+        )
+        # two far apart modes -> interquartile range is too wide, std is used
+        samples = np.concatenate([samples - 5, samples + 5])
+        self.assertLess(silverman_bandwidth(samples), 0.9 * 5.1 * 20_000**-0.2)
+
+        # constant samples still give a finite density
+        density = binned_kde(np.full(100, 3.0))
+        self.assertTrue(np.isfinite(density.kde).all())
+        self.assertEqual(density.histogram.sum() * np.diff(density.edges)[0], 1.0)
+        with self.assertRaises(Exception):
+            binned_kde(np.array([]))
+        with self.assertRaises(Exception):
+            binned_kde(np.array([1.0, np.nan]))
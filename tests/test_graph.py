@@ -1,20 +1,33 @@
 import string
 from unittest import TestCase
 
+import numpy as np
+
 from models.graph import Graph, Node
 
 
+def reaches(start: Node, goal: Node) -> bool:
+    visited = set()
+    stack = [start]
+    while stack:
+        node = stack.pop()
+        if node.id_ == goal.id_:
+            return True
+        if node.id_ not in visited:
+            visited.add(node.id_)
+            stack.extend(node.out_nodes)
+    return False
+
+
 class GraphTest(TestCase):
     def setUp(self) -> None:
         return super().setUp()
 
     def test_empty_graph(self):
         graph = Graph()
-        letters = set(char for char in string.ascii_lowercase)
-        node_ids = set(graph.nodes.keys())
-        self.assertSetEqual(letters, node_ids)
-        for node in graph.nodes.values():
-            self.assertIsNone(node)
+        self.assertDictEqual(graph.nodes, {})
+        self.assertEqual(len(graph.index), 0)
+        self.assertEqual(graph.get_free_node_id(), "a")
 
     def test_one_node(self):
         graph = Graph()
@@ -55,15 +68,15 @@ class GraphTest(TestCase):
 
     def test_full_graph(self):
         graph = Graph()
-        # can add only ascii lowercase chars as ids
         for _ in string.ascii_lowercase:
             graph.add_node()
 
-        with self.assertRaises(Exception):
-            graph.add_node()
-
+        # no limit, ids continue after 'z'
         free_node = graph.get_free_node_id()
-        assert free_node is None
+        self.assertEqual(free_node, "aa")
+        graph.add_node()
+        self.assertIsNotNone(graph.get_node_by_name("aa"))
+        graph.remove_node(Node("aa", "aa", graph))
 
         self.assertListEqual(graph.get_node_ids(), [x for x in string.ascii_lowercase])
         self.assertListEqual(
@@ -205,3 +218,161 @@ class GraphTest(TestCase):
         self.assertListEqual(["a"], sorted(node_c.get_in_node_ids()))
         self.assertListEqual(["c"], sorted(node_a.get_out_node_ids()))
         self.assertListEqual([], sorted(node_c.get_out_node_ids()))
+
+    def test_incremental_cycle_check(self):
+        graph = Graph()
+        for _ in range(12):
+            graph.add_node()
+        nodes = graph.get_nodes()
+
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            source, target = rng.choice(len(nodes), size=2)
+            source_node, target_node = nodes[source], nodes[target]
+            # reference: full dfs, the edge closes a cycle if the target
+            # reaches the source
+            exists = target_node.id_ in source_node.get_out_node_ids()
+            expected = not exists and not reaches(target_node, source_node)
+
+            self.assertEqual(graph.can_add_edge(source_node, target_node), expected)
+            if expected:
+                graph.add_edge(source_node, target_node)
+            elif exists and rng.random() < 0.5:
+                graph.remove_edge(source_node, target_node)
+
+            # every edge points forward in the maintained order
+            position = {
+                id_: idx for idx, id_ in enumerate(graph.get_topological_order())
+            }
+            for node in graph.get_nodes():
+                for out_node in node.out_nodes:
+                    self.assertLess(position[node.id_], position[out_node.id_])
+
+        graph.remove_node(nodes[0])
+        self.assertNotIn(nodes[0].id_, graph.get_topological_order())
+        for source_node in graph.get_nodes():
+            for target_node in graph.get_nodes():
+                exists = target_node.id_ in source_node.get_out_node_ids()
+                self.assertEqual(
+                    graph.can_add_edge(source_node, target_node),
+                    not exists and not reaches(target_node, source_node),
+                )
+
+    def test_reachability_index(self):
+        graph = Graph()
+        for _ in range(10):
+            graph.add_node()
+        nodes = graph.get_nodes()
+
+        rng = np.random.default_rng(1)
+        for step in range(200):
+            source, target = rng.choice(len(nodes), size=2)
+            source_node, target_node = nodes[source], nodes[target]
+            if graph.can_add_edge(source_node, target_node):
+                graph.add_edge(source_node, target_node)
+            elif target_node.id_ in source_node.get_out_node_ids() and step % 3 == 0:
+                graph.remove_edge(source_node, target_node)
+
+            # the batched query agrees with the single edge check
+            node = nodes[step % len(nodes)]
+            expected = {other.id_ for other in nodes if graph.can_add_edge(node, other)}
+            self.assertEqual(graph.get_addable_targets(node), expected)
+
+        graph.remove_node(nodes[3])
+        with self.assertRaises(Exception):
+            graph.get_addable_targets(nodes[3])
+        self.assertEqual(
+            graph.index.live,
+            sum(1 << graph.index.get_handle(id_) for id_ in graph.get_node_ids()),
+        )
+        new_node_id = graph.get_free_node_id()
+        graph.add_node()
+        assert new_node_id is not None
+        new_node = graph.get_node_by_id(new_node_id)
+        assert new_node is not None
+        # freed bit is reused and starts without any reachability
+        self.assertEqual(
+            graph.get_addable_targets(new_node),
+            set(graph.get_node_ids()) - {new_node_id},
+        )
+
+    def test_large_graph(self):
+        graph = Graph()
+        for _ in range(2000):
+            graph.add_node()
+        node_ids = graph.get_node_ids()
+        self.assertEqual(len(set(node_ids)), 2000)
+        # ids are used as names in formulas
+        for reserved in ["as", "if", "in", "is", "or", "np", "abs", "exp", "sin"]:
+            self.assertNotIn(reserved, node_ids)
+        self.assertTrue(all(node_id.isidentifier() for node_id in node_ids))
+
+        # chain with skip edges
+        nodes = graph.get_nodes()
+        for source, target in zip(nodes, nodes[1:]):
+            graph.add_edge(source, target)
+        for source, target in zip(nodes, nodes[7::7]):
+            graph.add_edge(source, target)
+        self.assertFalse(graph.can_add_edge(nodes[-1], nodes[0]))
+        self.assertTrue(graph.can_add_edge(nodes[0], nodes[-1]))
+
+        csr = graph.index.csr()
+        self.assertEqual(graph.index.nr_edges, 1999 + len(nodes[7::7]))
+        self.assertListEqual(
+            csr.successors(0).tolist(),
+            sorted(graph.index.get_handle(n.id_) for n in nodes[0].out_nodes),
+        )
+        self.assertListEqual(csr.predecessors(0).tolist(), [])
+        self.assertEqual(int(csr.in_degrees().sum()), graph.index.nr_edges)
+
+        # handles and ids of removed nodes are reused, lowest first
+        graph.remove_node(nodes[500])
+        self.assertEqual(len(graph.index), 1999)
+        self.assertFalse(graph.index.has_edge(499, 500))
+        self.assertEqual(csr.successors(499).tolist()[0], 500)
+        self.assertNotIn(500, graph.index.csr().successors(499).tolist())
+        self.assertEqual(graph.get_free_node_id(), nodes[500].id_)
+        graph.add_node()
+        self.assertEqual(graph.get_node_ids()[500], nodes[500].id_)
+        self.assertTrue(graph.can_add_edge(nodes[1999], graph.get_nodes()[500]))
+
+    def test_generation_hierarchy(self):
+        graph = Graph()
+        for _ in range(300):
+            graph.add_node()
+        nodes = graph.get_nodes()
+        rng = np.random.default_rng(2)
+        for _ in range(900):
+            source, target = sorted(rng.choice(len(nodes), size=2, replace=False))
+            if graph.can_add_edge(nodes[source], nodes[target]):
+                graph.add_edge(nodes[source], nodes[target])
+
+        hierarchy = graph._get_generation_hierarchy()
+        layer_of = {
+            node_id: layer
+            for layer, node_ids in hierarchy.items()
+            for node_id in node_ids
+        }
+        self.assertEqual(len(layer_of), len(nodes))
+        for node in nodes:
+            # one layer after the latest in node
+            expected = max((layer_of[n.id_] + 1 for n in node.in_nodes), default=0)
+            self.assertEqual(layer_of[node.id_], expected)
+
+        # cached until the structure changes
+        cached = graph._hierarchy
+        hierarchy[0].clear()
+        self.assertIs(graph._hierarchy, cached)
+        self.assertEqual(graph._get_generation_hierarchy(), cached)
+        graph.remove_edge(nodes[0], nodes[0].out_nodes[0])
+        graph._get_generation_hierarchy()
+        self.assertIsNot(graph._hierarchy, cached)
+
+        self.assertDictEqual(Graph()._get_generation_hierarchy(), {0: set()})
+
+        # in nodes added behind the graph's back
+        a, b = nodes[-1], nodes[-2]
+        b.add_in_node(a)
+        graph.index.version += 1
+        with self.assertRaises(Exception):
+            graph._get_generation_hierarchy()
@@ -1,3 +1,5 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest import TestCase
 from unittest.mock import patch
 
@@ -6,7 +8,16 @@ import numpy as np
 import numpy.testing as npt
 
 from models.graph import Graph
-from models.mechanism import ClassificationMechanism, RegressionMechanism
+from models.mechanism import (
+    ClassificationMechanism,
+    FormulaCache,
+    FusedNode,
+    RegressionMechanism,
+    ThreadedBackend,
+    compile_fused_kernel,
+    optimize_formula,
+    plan_formulas,
+)
 
 # TODO: convert test case inputs from float list to np.array
 
@@ -154,6 +165,262 @@ class RegresionMechanismTest(TestCase):
         self.assertTrue(all(np.isfinite(result.values)))
 
 
+class FormulaCacheTest(TestCase):
+    def test_compile_once(self):
+        cache = FormulaCache(maxsize=2)
+        first = cache.get("a + c*2", {"a", "c"})
+        second = cache.get("a + c*2", ["c", "a"])
+        self.assertIs(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        npt.assert_almost_equal(
+            first({"a": np.array([1.0, 2.0]), "c": np.array([0.5, -1.0])}),
+            np.array([2.0, 0.0]),
+        )
+
+        # different input names -> different entry
+        cache.get("a + c*2", {"a", "c", "n_a"})
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        # least recently used entry is evicted
+        cache.get("a", {"a"})
+        self.assertEqual(len(cache), 2)
+        cache.get("a + c*2", {"a", "c"})
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+        # only used inputs are arguments
+        self.assertEqual(cache.get("a + c*2", {"a", "c", "n_a"}).arg_names, ("a", "c"))
+
+    def test_invalid_formula(self):
+        regression = RegressionMechanism(["a +"], {"a": [1.0, 2.0]})
+        result = regression.transform()
+        self.assertIsNone(result.values)
+        self.assertIsNotNone(result.error)
+
+
+class CommonSubexpressionTest(TestCase):
+    def test_plan_formulas(self):
+        names = frozenset(["a", "b", "c"])
+        plan = plan_formulas(
+            ("a + b > 0", "a + b > 2", "(a + b < -1) & (c > 0)"), names
+        )
+        self.assertEqual(plan.temporaries, (("_cse_0", "a + b"),))
+        self.assertEqual(
+            plan.formulas, ("_cse_0 > 0", "_cse_0 > 2", "(_cse_0 < -1) & (c > 0)")
+        )
+
+        # nested subexpressions are evaluated before the expressions using them
+        plan = plan_formulas(("(a + b)*2 + sin(a + b) > 0", "(a + b)*2 < 1"), names)
+        self.assertEqual(
+            plan.temporaries, (("_cse_1", "a + b"), ("_cse_0", "_cse_1 * 2"))
+        )
+        self.assertEqual(plan.formulas, ("_cse_0 + sin(_cse_1) > 0", "_cse_0 < 1"))
+
+        # constants and non elementwise formulas are left alone
+        formulas = ("a > -1.0", "b < -1.0", "a.mean() + a.mean() > 0")
+        plan = plan_formulas(formulas, names)
+        self.assertEqual(plan.temporaries, ())
+        self.assertEqual(plan.formulas, formulas)
+
+    def test_shared_subexpressions(self):
+        rng = np.random.default_rng(2)
+        inputs = {"a": rng.normal(size=1000), "b": rng.normal(size=1000)}
+        formulas = ["exp(a) + b > 2", "(exp(a) + b < 0.5) & (b > 0)"]
+        for class_assignment in ["strict", "first_match"]:
+            result = ClassificationMechanism(
+                formulas, inputs, class_assignment, chunk_size=300
+            ).transform()
+            assert result.values is not None
+            expected = np.full(1000, 2)
+            expected[(np.exp(inputs["a"]) + inputs["b"] < 0.5) & (inputs["b"] > 0)] = 1
+            expected[np.exp(inputs["a"]) + inputs["b"] > 2] = 0
+            npt.assert_array_equal(result.values, expected)
+
+        # failing classes are still reported one by one
+        result = ClassificationMechanism(
+            ["x + a > 0", "x + a < 0", "a > 5"], inputs
+        ).transform()
+        self.assertEqual(result.error, "Failed to evaluate classes: [0, 1]")
+
+        # a failing temporary fails the classes using it
+        inputs = {"a": np.arange(4.0), "b": np.arange(3.0)}
+        result = ClassificationMechanism(
+            ["a + b > 0", "a + b < -1", "a > 5"], inputs
+        ).transform()
+        self.assertEqual(result.error, "Failed to evaluate classes: [0, 1]")
+
+        # negative constants keep their parentheses in temporaries
+        plan = plan_formulas(
+            ("(-1.0 * 2) ** a + b > 0", "(-1.0 * 2) ** a + b < -1"),
+            frozenset(["a", "b"]),
+        )
+        self.assertEqual(plan.temporaries, (("_cse_0", "(-2.0) ** a + b"),))
+        inputs = {"a": np.array([0.0, 1.0, 2.0]), "b": np.zeros(3)}
+        result = ClassificationMechanism(
+            ["(-1.0 * 2) ** a + b > 0", "(-1.0 * 2) ** a + b < -1"], inputs
+        ).transform()
+        assert result.values is not None
+        self.assertListEqual(result.values.tolist(), [0, 1, 0])
+
+
+class FormulaOptimizerTest(TestCase):
+    def test_optimize_formula(self):
+        names = frozenset(["a", "b", "c", "n_b"])
+        cases = [
+            ("2*3*a + 0*b + log(exp(c))", "6 * a + c"),
+            ("n_b*1.0", "n_b"),
+            ("-(-a) + +b - 0", "a + b"),
+            ("a**1 / 1", "a"),
+            ("2**0.5 * sin(a)*1", "1.4142135623730951 * sin(a)"),
+            # results would not be floats / lose their shape
+            ("(a > 0) * 1", "(a > 0) * 1"),
+            ("0*a", "0*a"),
+            ("1/0 + a", "1 / 0 + a"),
+            # beyond the float range or too expensive -> not folded
+            ("10**400 + a", "10 ** 400 + a"),
+            ("9**9**9 * a", "9 ** 387420489 * a"),
+            ("2.0**2000 * a", "2.0 ** 2000 * a"),
+            # folded negative constants keep their parentheses
+            ("(-1) ** a", "(-1) ** a"),
+            ("(-2.0) ** 2 * a", "4.0 * a"),
+            ("(-1.0 * 2) ** a", "(-2.0) ** a"),
+            # unknown names or not elementwise -> unchanged
+            ("x*1", "x*1"),
+            ("a.mean()*1", "a.mean()*1"),
+        ]
+        for formula, expected in cases:
+            self.assertEqual(optimize_formula(formula, names), expected)
+
+        # both factors fold, their product is beyond the float range
+        product = f"{10**300} * {10**300} + a"
+        self.assertEqual(optimize_formula("10**300 * 10**300 + a", names), product)
+
+    def test_optimized_regression(self):
+        inputs = {"a": np.array([1.0, -2.0]), "b": np.array([3.0, 0.5])}
+        result = RegressionMechanism(["2*3*a + 0*b + log(exp(b))"], inputs).transform()
+        assert result.values is not None
+        npt.assert_array_equal(result.values, np.array([9.0, -11.5]))
+
+        result = RegressionMechanism(["x*1"], inputs).transform()
+        self.assertIsNotNone(result.error)
+
+        # '(-1) ** a' is not '-(1 ** a)'
+        inputs = {"a": np.array([0.0, 1.0, 2.0, 3.0])}
+        result = RegressionMechanism(["(-1) ** floor(a)"], inputs).transform()
+        assert result.values is not None
+        npt.assert_array_equal(result.values, np.array([1.0, -1.0, 1.0, -1.0]))
+
+
+class ChunkedMechanismTest(TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.inputs = {
+            "a": rng.normal(size=10_001),
+            "b": rng.normal(size=10_001),
+            "n_c": rng.normal(size=10_001),
+        }
+
+    def test_chunked_regression(self):
+        for formula in ["sin(a)**2 + exp(b)*n_c", "a - a.mean()", "2.0"]:
+            expected = RegressionMechanism([formula], self.inputs).transform()
+            chunked = RegressionMechanism([formula], self.inputs, chunk_size=1000)
+            result = chunked.transform()
+            assert result.error is None
+            npt.assert_array_equal(result.values, expected.values)
+
+    def test_chunked_classification(self):
+        formulas = ["a + b > 1.0", "(a + b < -1.0) & (n_c > 0.0)"]
+        for class_assignment in ["strict", "first_match"]:
+            expected = ClassificationMechanism(
+                formulas, self.inputs, class_assignment
+            ).transform()
+            chunked = ClassificationMechanism(
+                formulas, self.inputs, class_assignment, chunk_size=999
+            )
+            result = chunked.transform()
+            assert result.error is None
+            npt.assert_array_equal(result.values, expected.values)
+
+        chunked = ClassificationMechanism(
+            ["a > 0.0", "a > 1.0"], self.inputs, chunk_size=999
+        )
+        self.assertEqual(chunked.transform().error, "Failed to evaluate classes: [1]")
+
+
+class MechanismInputTest(TestCase):
+    def test_zero_copy_inputs(self):
+        a = np.arange(10, dtype=np.float64)
+        regression = RegressionMechanism(["a * 2"], {"a": a, "b": a[::2]})
+        self.assertTrue(np.shares_memory(regression.values["a"], a))
+        self.assertFalse(regression.values["a"].flags.writeable)
+        self.assertTrue(a.flags.writeable)
+        # strided view needs a contiguous copy
+        self.assertEqual(regression.bytes_copied, 5 * 8)
+
+        classification = ClassificationMechanism(
+            ["a > 2"], {"a": [1, 2, 3], "b": np.array([1, 2, 3], dtype=np.int32)}
+        )
+        self.assertEqual(classification.bytes_copied, 2 * 3 * 8)
+        result = classification.transform()
+        assert result.values is not None
+        self.assertListEqual(result.values.tolist(), [1, 1, 0])
+
+        with self.assertRaises(ValueError):
+            regression.values["a"][0] = 1.0
+
+
+class ThreadedBackendTest(TestCase):
+    def test_thread_count(self):
+        backend = ThreadedBackend(max_workers=4, min_rows_per_thread=1000)
+        self.assertEqual(backend.nr_threads(500), 1)
+        self.assertEqual(backend.nr_threads(2500), 2)
+        self.assertEqual(backend.nr_threads(1_000_000), 4)
+        row_slices = backend.row_slices(2500, None)
+        self.assertListEqual(row_slices, [slice(0, 1250), slice(1250, 2500)])
+
+    def test_threaded_mechanisms(self):
+        rng = np.random.default_rng(1)
+        inputs = {"a": rng.normal(size=10_000), "b": rng.normal(size=10_000)}
+        backend = ThreadedBackend(max_workers=4, min_rows_per_thread=1000)
+
+        formulas = ["sin(a)**2 + exp(b)*a"]
+        expected = RegressionMechanism(formulas, inputs).transform()
+        result = RegressionMechanism(formulas, inputs, backend=backend).transform()
+        npt.assert_array_equal(result.values, expected.values)
+
+        formulas = ["a > 1.0", "b > 1.0"]
+        expected = ClassificationMechanism(formulas, inputs, "first_match").transform()
+        result = ClassificationMechanism(
+            formulas, inputs, "first_match", backend=backend
+        ).transform()
+        npt.assert_array_equal(result.values, expected.values)
+
+        result = ClassificationMechanism(formulas, inputs, backend=backend).transform()
+        self.assertEqual(result.error, "Failed to evaluate classes: [1]")
+
+    def test_shared_executor(self):
+        backend = ThreadedBackend(max_workers=2)
+        created = []
+
+        def slow_executor(*args, **kwargs):
+            # widen the window between the check and the assignment
+            time.sleep(0.01)
+            created.append(ThreadPoolExecutor(*args, **kwargs))
+            return created[-1]
+
+        row_slices = [slice(0, 1), slice(1, 2)]
+        with patch("models.mechanism.ThreadPoolExecutor", slow_executor):
+            with ThreadPoolExecutor(8) as callers:
+                results = list(
+                    callers.map(
+                        lambda _: backend.map(lambda rows: rows.start, row_slices),
+                        range(8),
+                    )
+                )
+        self.assertListEqual(results, [[0, 1]] * 8)
+        self.assertEqual(len(created), 1)
+        created[0].shutdown()
+
+
 # TODO: refactor test cases -> no more on hot encoding
 class ClassficationMechanismTest(TestCase):
     def test_simple_classification_mechanism(self):
@@ -271,6 +538,65 @@ class ClassficationMechanismTest(TestCase):
             assert result.values is not None
             self.assertListEqual(result.values.tolist(), expected)
 
+    def test_classification_overlap(self):
+        formulas = ["a > 0.0", "a > 1.0", "a < -1.0", "a"]
+        classification = ClassificationMechanism(
+            formulas, {"a": np.array([-2.0, 0.5, 2.0])}
+        )
+        result = classification.transform()
+        self.assertIsNone(result.values)
+        # class 1 overlaps class 0, class 3 is not a boolean
+        self.assertEqual(result.error, "Failed to evaluate classes: [1, 3]")
+
+    def test_classification_first_match(self):
+        formulas = ["a > 0.0", "a > 1.0", "a < -1.0"]
+        inputs = {"a": np.array([-2.0, 0.5, 2.0, -0.5])}
+        classification = ClassificationMechanism(formulas, inputs, "first_match")
+        result = classification.transform()
+        assert result.error is None
+        assert result.values is not None
+        self.assertListEqual(result.values.tolist(), [2, 0, 0, 3])
+
+        # invalid classes are still reported, even without remaining rows
+        formulas = ["a > -5.0", "a"]
+        classification = ClassificationMechanism(formulas, inputs, "first_match")
+        result = classification.transform()
+        self.assertEqual(result.error, "Failed to evaluate classes: [1]")
+
+        # reductions are taken over all rows, same labels as strict
+        formulas = ["a < -2", "a > a.mean()"]
+        inputs = {"a": np.array([-3.0, -1.0, 0.0, 1.0, 5.0]), "b": np.zeros(5)}
+        for class_assignment in ["strict", "first_match"]:
+            classification = ClassificationMechanism(formulas, inputs, class_assignment)
+            result = classification.transform()
+            assert result.values is not None
+            self.assertListEqual(result.values.tolist(), [0, 2, 2, 1, 1])
+
+    def test_classification_many_rows(self):
+        formulas = [
+            "(a > 1.0) & (b > 0.0)",
+            "a < -1.0",
+            "(b < -1.0) & (a > -1.0) & (a < 1.0)",
+        ]
+        rng = np.random.default_rng(0)
+        inputs = {"a": rng.normal(size=10_000), "b": rng.normal(size=10_000)}
+        classification = ClassificationMechanism(formulas, inputs)
+        result = classification.transform()
+        assert result.error is None
+        assert result.values is not None
+
+        a, b = inputs["a"], inputs["b"]
+        expected = np.full(10_000, 3)
+        expected[(b < -1.0) & (a > -1.0) & (a < 1.0)] = 2
+        expected[a < -1.0] = 1
+        expected[(a > 1.0) & (b > 0.0)] = 0
+        npt.assert_array_equal(result.values, expected)
+
+        classification = ClassificationMechanism(formulas, inputs, "first_match")
+        result = classification.transform()
+        assert result.values is not None
+        npt.assert_array_equal(result.values, expected)
+
     def test_graph_mechanism(self):
         graph = Graph()
         graph.add_node()  # a
@@ -652,6 +978,204 @@ class FullPipelineTest(TestCase):
         data.plot.scatter(x="a", y="b", c="c", colormap="viridis")
         plt.savefig("full_mechanism_2.png")
 
+        # noise and parent data are float64 arrays -> no conversions
+        self.assertEqual(graph.last_generation.bytes_copied, 0)
+
+        chunked_data = graph.generate_full_data_set(chunk_size=7)
+        self.assertTrue(chunked_data.equals(data))
+
+    @patch("models.noise.CONSTANTS.NR_DATA_POINTS", 1000)
+    def test_fused_mechanism(self):
+        graph = Graph()
+        for _ in range(4):
+            graph.add_node()  # a, b, c, d
+
+        a = graph.get_node_by_id("a")
+        b = graph.get_node_by_id("b")
+        c = graph.get_node_by_id("c")
+        d = graph.get_node_by_id("d")
+        assert a is not None and b is not None and c is not None and d is not None
+
+        graph.add_edge(a, b)
+        graph.add_edge(a, c)
+        graph.add_edge(b, d)
+        graph.add_edge(c, d)
+
+        a.mechanism_metadata.formulas["0"] = "n_a"
+        b.mechanism_metadata.formulas["0"] = "exp(a)*2*3 + n_b"
+        c.change_type("classification")
+        c.mechanism_metadata.add_class()
+        c.mechanism_metadata.formulas["0"] = "a + n_c > 1"
+        c.mechanism_metadata.formulas["1"] = "a + n_c < -1"
+        d.mechanism_metadata.formulas["0"] = "b * c + n_d"
+        for node in [a, b, c, d]:
+            node.change_state("locked")
+
+        expected = graph.generate_full_data_set()
+        for chunk_size in [None, 100]:
+            fused = graph.generate_full_data_set(chunk_size=chunk_size, fused=True)
+            self.assertTrue(fused.equals(expected))
+
+        sobol = graph.generate_full_data_set(sampling="sobol", nr_points=512)
+        self.assertEqual(sobol.shape, (512, 4))
+        fused = graph.generate_full_data_set(
+            fused=True, sampling="sobol", nr_points=512
+        )
+        self.assertTrue(fused.equals(sobol))
+
+        # not elementwise -> node by node
+        d.mechanism_metadata.formulas["0"] = "b - b.mean()"
+        expected = graph.generate_full_data_set()
+        self.assertTrue(graph.generate_full_data_set(fused=True).equals(expected))
+
+        # overlapping classes
+        c.mechanism_metadata.formulas["1"] = "a + n_c > 2"
+        with self.assertRaises(Exception):
+            graph.generate_full_data_set(fused=True)
+
+    @patch("models.noise.CONSTANTS.NR_DATA_POINTS", 1000)
+    def test_fused_classification_parent(self):
+        graph = Graph()
+        for _ in range(3):
+            graph.add_node()  # a, b, c
+
+        a, b, c = graph.get_nodes()
+        graph.add_edge(a, b)
+        graph.add_edge(b, c)
+        a.mechanism_metadata.formulas["0"] = "n_a"
+        b.change_type("classification")
+        b.mechanism_metadata.formulas["0"] = "a + n_b > 0"
+        for node in [a, b, c]:
+            node.change_state("locked")
+
+        # children see the class labels as floats on both paths
+        for formula, dtypes in [
+            ("(b + 1) ** -1 + n_c", [np.float64, np.float32]),
+            ("b*100000*100000 + n_c", [np.float64, np.float32]),
+            ("sin(b) + b / 3", [np.float64, np.float32]),
+        ]:
+            c.change_state("editable")
+            c.mechanism_metadata.formulas["0"] = formula
+            c.change_state("locked")
+            for dtype in dtypes:
+                expected = graph.generate_full_data_set(dtype=dtype)
+                fused = graph.generate_full_data_set(fused=True, dtype=dtype)
+                self.assertTrue(fused.equals(expected), formula)
+
+    def test_fused_reserved_names(self):
+        # node ids never shadow the parameters of the kernel
+        nodes = tuple(
+            FusedNode(id_, "regression", (f"n_{id_} + {parent}",), (parent,), "strict")
+            for id_, parent in [("out", "a"), ("rows", "out"), ("noise", "rows")]
+        )
+        kernel = compile_fused_kernel(
+            (FusedNode("a", "regression", ("n_a",), (), "strict"),) + nodes
+        )
+        assert kernel is not None
+        noise = {id_: np.ones(4) for id_ in ["a", "out", "rows", "noise"]}
+        out = {id_: np.empty(4) for id_ in noise}
+        kernel(noise, out, slice(0, 4))
+        npt.assert_array_equal(out["noise"], np.full(4, 4.0))
+
+    def test_float32_generation(self):
+        graph = Graph()
+        for _ in range(3):
+            graph.add_node()  # a, b, c
+
+        a = graph.get_node_by_id("a")
+        b = graph.get_node_by_id("b")
+        c = graph.get_node_by_id("c")
+        assert a is not None and b is not None and c is not None
+
+        graph.add_edge(a, b)
+        graph.add_edge(b, c)
+
+        a.mechanism_metadata.formulas["0"] = "n_a"
+        b.mechanism_metadata.formulas["0"] = "sqrt(2) * a + n_b"
+        c.change_type("classification")
+        c.mechanism_metadata.formulas["0"] = "b + n_c > 0"
+        for node in [a, b, c]:
+            node.change_state("locked")
+
+        for fused in [False, True]:
+            data = graph.generate_full_data_set(fused=fused, dtype=np.float32)
+            self.assertEqual(data["a"].dtype, np.float32)
+            self.assertEqual(data["b"].dtype, np.float32)
+            self.assertEqual(graph.last_generation.bytes_copied, 0)
+
+        drift = graph.precision_drift()
+        self.assertEqual(sorted(drift.index), ["a", "b", "c"])
+        self.assertTrue((drift.loc[["a", "b"], "max_abs_error"] < 1e-5).all())
+        self.assertTrue(np.isnan(drift.loc["a", "mismatch_rate"]))
+        self.assertLess(drift.loc["c", "mismatch_rate"], 0.01)
+
+        # large python constants do not promote float32 to float64
+        for node in [a, b]:
+            node.change_state("editable")
+        a.mechanism_metadata.formulas["0"] = "n_a * 100000"
+        b.mechanism_metadata.formulas["0"] = "a + n_b"
+        for node in [a, b]:
+            node.change_state("locked")
+        expected = graph.generate_full_data_set(dtype=np.float32)
+        self.assertEqual(expected["a"].dtype, np.float32)
+        self.assertEqual(graph.last_generation.bytes_copied, 0)
+        fused = graph.generate_full_data_set(fused=True, dtype=np.float32)
+        self.assertTrue(fused.equals(expected))
+
+        # only float results are cast, bool/int regressions keep their dtype
+        inputs = {"a": np.array([-1.5, 0.5, 2.5], dtype=np.float32)}
+        for chunk_size in [None, 2]:
+            for formula, dtype in [
+                ("a > 0", np.bool_),
+                ("(a > 0) * 1", np.int64),
+                ("a * 100000", np.float32),
+            ]:
+                result = RegressionMechanism(
+                    [formula], inputs, chunk_size=chunk_size, dtype=np.float32
+                ).transform()
+                assert result.values is not None
+                self.assertEqual(result.values.dtype, dtype, formula)
+
+    @patch("models.noise.CONSTANTS.NR_DATA_POINTS", 20_000)
+    def test_parallel_generation(self):
+        graph = Graph()
+        for _ in range(10):
+            graph.add_node()
+        root, *siblings, sink = graph.get_nodes()
+        root.mechanism_metadata.formulas["0"] = "n_a"
+        for node in siblings:
+            graph.add_edge(root, node)
+            graph.add_edge(node, sink)
+            node.mechanism_metadata.formulas["0"] = f"sin(a) * cos(n_{node.id_})"
+        sink.mechanism_metadata.formulas["0"] = " + ".join(
+            node.id_ for node in siblings
+        )
+        for node in graph.get_nodes():
+            node.change_state("locked")
+
+        # serial unless parallelism is asked for
+        serial = graph.generate_full_data_set()
+        self.assertEqual(graph.last_generation.max_workers, 1)
+        for _ in range(3):
+            parallel = graph.generate_full_data_set(max_workers=4)
+            self.assertTrue(parallel.equals(serial))
+
+        report = graph.last_generation
+        self.assertEqual(report.max_workers, 4)
+        self.assertSetEqual(set(report.node_timings), set(graph.get_node_ids()))
+        for node in graph.get_nodes():
+            timing = report.node_timings[node.id_]
+            self.assertLessEqual(timing.start + timing.noise, timing.end)
+            self.assertLessEqual(timing.end, report.wall_time)
+            # a node only starts after its in nodes are done
+            for in_node in node.in_nodes:
+                self.assertLessEqual(report.node_timings[in_node.id_].end, timing.start)
+
+        # errors of a worker reach the caller
+        siblings[3].mechanism_metadata.formulas["0"] = "a + unknown"
+        with self.assertRaises(Exception):
+            graph.generate_full_data_set(max_workers=4)
+
     def test_lockable_1(self):
         graph = Graph()
         graph.add_node()  # a
@@ -1,9 +1,26 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
 from unittest import TestCase
 from unittest.mock import patch
 
 import matplotlib.pyplot as plt
+import numpy as np
+import numpy.testing as npt
+import scipy.stats as stats
 
-from models.noise import Distribution, Noise
+from models.noise import (
+    Distribution,
+    EmpiricalTable,
+    Noise,
+    SAMPLING_MODES,
+    SampleCache,
+    allocate_rows,
+    base_uniforms,
+    load_empirical_table,
+    stream_seed,
+)
 
 
 class DataTest(TestCase):
@@ -100,6 +117,268 @@ class DataTest(TestCase):
         plt.hist(values)
         plt.savefig("triple_distribution.png")
 
+    @patch("models.noise.CONSTANTS.NR_DATA_POINTS", 1000)
+    def test_independent_streams(self):
+        a, b = Noise.default_noise("a"), Noise.default_noise("b")
+        a_values, b_values = a.generate_data(), b.generate_data()
+        # reproducible per stream, but no shared values between nodes
+        npt.assert_array_equal(a_values, a.generate_data())
+        self.assertFalse(np.array_equal(a_values, b_values))
+        self.assertLess(abs(np.corrcoef(a_values, b_values)[0, 1]), 0.1)
+
+        # another root seed -> other values
+        other = a.generate_data(stream_seed("a", 1))
+        self.assertFalse(np.array_equal(a_values, other))
+
+        # sub distributions draw from own streams
+        a.add_distribution()
+        values = a.generate_data()
+        self.assertFalse(np.array_equal(values[:500], values[500:]))
+
+        # no global state -> parallel generation gives the same values
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            parallel = list(executor.map(lambda n: n.generate_data(), [a, b]))
+        npt.assert_array_equal(parallel[0], values)
+        npt.assert_array_equal(parallel[1], b_values)
+
+    @patch("models.noise.CONSTANTS.NR_DATA_POINTS", 3000)
+    def test_mixture(self):
+        self.assertListEqual(allocate_rows([1] * 7, 3000), [429] * 4 + [428] * 3)
+        self.assertListEqual(allocate_rows([1, 2, 1], 10), [3, 5, 2])
+        with self.assertRaises(Exception):
+            allocate_rows([0, 0], 10)
+
+        # uneven buckets, one output array
+        noise = Noise.default_noise("a")
+        for _ in range(6):
+            noise.add_distribution()
+        for idx, distribution in enumerate(noise.get_distributions()):
+            param_loc = distribution.get_parameter_by_name("loc")
+            assert param_loc is not None
+            param_loc.change_current(idx * 1.5)
+        values = noise.generate_data()
+        self.assertEqual(values.shape, (3000,))
+        self.assertTrue(values.flags.owndata)
+        self.assertLess(abs(values[:429].mean()), 0.2)
+        self.assertLess(abs(values[-428:].mean() - 9.0), 0.2)
+
+        # weights
+        distributions = noise.get_distributions()
+        for distribution in distributions[1:]:
+            noise.remove_distribution(distribution)
+        noise.add_distribution()
+        distr_0, distr_1 = noise.get_distributions()
+        distr_1.change_distribution("bernoulli")
+        distr_0.change_distribution("uniform")
+        distr_0.change_weight(3)
+        param_loc = distr_0.get_parameter_by_name("loc")
+        assert param_loc is not None
+        param_loc.change_current(2)
+        values = noise.generate_data()
+        self.assertEqual(np.sum(values >= 2), 2250)
+        self.assertTrue((values[:2250] >= 2).all())
+
+        # shuffled -> same values, not ordered by sub distribution
+        noise.shuffle = True
+        shuffled = noise.generate_data()
+        npt.assert_array_equal(np.sort(shuffled), np.sort(values))
+        self.assertFalse((shuffled[:2250] >= 2).all())
+        npt.assert_array_equal(shuffled, noise.generate_data())
+
+    @patch("models.noise.CONSTANTS.NR_DATA_POINTS", 1000)
+    def test_sample_cache(self):
+        # room for two arrays of 1000 float64 values
+        cache = SampleCache(max_bytes=16_000)
+        noise = Noise.default_noise("a")
+        distr_0 = noise.get_distribution_by_id("0")
+        assert distr_0 is not None
+        param_loc = distr_0.get_parameter_by_name("loc")
+        assert param_loc is not None
+
+        first = cache.get(noise)
+        npt.assert_array_equal(first, noise.generate_data())
+        self.assertFalse(first.flags.writeable)
+        self.assertIs(cache.get(noise), first)
+
+        # slider moved and back again
+        param_loc.change_current(2)
+        moved = cache.get(noise)
+        self.assertAlmostEqual(moved.mean() - first.mean(), 2.0)
+        param_loc.change_current(0)
+        self.assertIs(cache.get(noise), first)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 2)
+
+        # seed and dtype are part of the key, budget -> oldest evicted
+        cache.get(noise, stream_seed("a", 1))
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.get(noise, dtype=np.float32).dtype, np.float32)
+        self.assertEqual(
+            cache.stats(),
+            {
+                "entries": 2,
+                "nbytes": 12_000,
+                "hits": 2,
+                "misses": 4,
+                "evictions": 2,
+            },
+        )
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    @patch("models.noise.CONSTANTS.NR_DATA_POINTS", 1000)
+    def test_incremental_resampling(self):
+        noise = Noise.default_noise("a")
+        for _ in range(3):
+            noise.add_distribution()
+        distr_2 = noise.get_distribution_by_id("2")
+        assert distr_2 is not None
+        param_loc = distr_2.get_parameter_by_name("loc")
+        assert param_loc is not None
+
+        first = noise.generate_data(incremental=True)
+        self.assertListEqual(noise.last_resampled, ["0", "1", "2", "3"])
+        npt.assert_array_equal(first, noise.generate_data())
+
+        # only the changed sub distribution is drawn again
+        param_loc.change_current(5)
+        second = noise.generate_data(incremental=True)
+        self.assertListEqual(noise.last_resampled, ["2"])
+        npt.assert_array_equal(second, noise.generate_data())
+        npt.assert_array_equal(second[:500], first[:500])
+        self.assertFalse(np.array_equal(second[500:750], first[500:750]))
+        # the previous result is left untouched
+        self.assertAlmostEqual(first[500:750].mean(), 0.0, delta=0.3)
+
+        distr_2.change_distribution("laplace")
+        npt.assert_array_equal(
+            noise.generate_data(incremental=True), noise.generate_data()
+        )
+        self.assertListEqual(noise.last_resampled, ["2"])
+
+        # other layout -> everything again
+        distr_2.change_weight(2)
+        npt.assert_array_equal(
+            noise.generate_data(incremental=True), noise.generate_data()
+        )
+        self.assertListEqual(noise.last_resampled, ["0", "1", "2", "3"])
+        noise.generate_data(stream_seed("a", 1), incremental=True)
+        self.assertListEqual(noise.last_resampled, ["0", "1", "2", "3"])
+
+        noise.shuffle = True
+        noise.generate_data(stream_seed("a", 1), incremental=True)
+        self.assertListEqual(noise.last_resampled, [])
+        npt.assert_array_equal(
+            noise.generate_data(incremental=True), noise.generate_data()
+        )
+
+    @patch("models.noise.CONSTANTS.NR_DATA_POINTS", 2000)
+    def test_common_random_numbers(self):
+        noise = Noise.default_noise("a")
+        noise.common_random_numbers = True
+        noise.add_distribution()
+        distr_0, distr_1 = noise.get_distributions()
+        param_loc = distr_0.get_parameter_by_name("loc")
+        assert param_loc is not None
+        param_scale = distr_0.get_parameter_by_name("scale")
+        assert param_scale is not None
+        distr_1.change_distribution("poisson")
+
+        first = noise.generate_data()
+        self.assertAlmostEqual(first[:1000].mean(), 0.0, delta=0.1)
+        self.assertAlmostEqual(first[1000:].mean(), 1.0, delta=0.1)
+
+        # same draws, only moved
+        param_loc.change_current(2)
+        param_scale.change_current(3)
+        moved = noise.generate_data(incremental=True)
+        npt.assert_allclose(moved[:1000], first[:1000] * 3 + 2)
+        npt.assert_array_equal(moved[1000:], first[1000:])
+        param_loc.change_current(0)
+        param_scale.change_current(1)
+        npt.assert_allclose(noise.generate_data(incremental=True), first)
+        self.assertListEqual(noise.last_resampled, ["0"])
+
+        # inverse cdf of the same base uniforms for all other distributions
+        for name in ["lognorm", "uniform", "laplace", "binom", "randint"]:
+            distr_0.change_distribution(name)
+            values = noise.generate_data()[:1000]
+            uniforms = stats.norm.cdf(first[:1000])
+            expected = distr_0.generator.ppf(uniforms, **distr_0.get_parameter_values())
+            npt.assert_allclose(values, expected, atol=1e-6)
+
+        # without common random numbers -> new samples
+        noise.common_random_numbers = False
+        self.assertFalse(np.array_equal(noise.generate_data()[:1000], values))
+
+    def test_sampling_modes(self):
+        rng = np.random.default_rng(0)
+        for sampling in SAMPLING_MODES:
+            uniforms = base_uniforms(rng, 1000, sampling)
+            self.assertEqual(uniforms.shape, (1000,))
+            self.assertTrue(((uniforms > 0) & (uniforms < 1)).all())
+        # one draw per stratum
+        uniforms = base_uniforms(rng, 1000, "lhs")
+        npt.assert_array_equal(np.sort(np.floor(uniforms * 1000)), np.arange(1000))
+        uniforms = base_uniforms(rng, 1000, "antithetic")
+        self.assertAlmostEqual(uniforms.mean(), 0.5)
+        with self.assertRaises(Exception):
+            base_uniforms(rng, 10, "unknown")  # type: ignore
+
+        # quantiles of the normal noise are much closer with fewer points
+        noise = Noise.default_noise("a")
+        errors = {}
+        for sampling in SAMPLING_MODES:
+            values = noise.generate_data(sampling=sampling, nr_points=256)
+            self.assertEqual(values.shape, (256,))
+            errors[sampling] = stats.kstest(values, "norm").statistic
+        for sampling in ["sobol", "halton", "lhs"]:
+            self.assertLess(errors[sampling] * 5, errors["pseudo"])
+        self.assertAlmostEqual(
+            noise.generate_data(sampling="antithetic", nr_points=256).mean(), 0.0
+        )
+
+        noise.sampling = "sobol"
+        npt.assert_array_equal(
+            noise.generate_data(nr_points=256),
+            noise.generate_data(sampling="sobol", nr_points=256),
+        )
+        # no inverse cdf needed for the discrete distributions either
+        distr_0 = noise.get_distribution_by_id("0")
+        assert distr_0 is not None
+        distr_0.change_distribution("poisson")
+        values = noise.generate_data(nr_points=256)
+        self.assertAlmostEqual(values.mean(), 1.0, delta=0.05)
+
+    def test_density_preview(self):
+        noise = Noise.default_noise("a")
+        density = noise.density_preview(grid_size=200)
+        self.assertEqual(density.x.shape, (200,))
+        self.assertEqual(len(density.support), 0)
+        npt.assert_allclose(density.pdf, stats.norm.pdf(density.x))
+        self.assertAlmostEqual(np.trapz(density.pdf, density.x), 1.0, delta=0.01)
+
+        # weighted mixture of a continuous and a discrete part
+        noise.add_distribution()
+        distr_0, distr_1 = noise.get_distributions()
+        distr_0.change_weight(3)
+        distr_1.change_distribution("binom")
+        param_n = distr_1.get_parameter_by_name("n")
+        assert param_n is not None
+        param_n.change_current(4)
+        density = noise.density_preview()
+        self.assertAlmostEqual(np.trapz(density.pdf, density.x), 0.75, delta=0.01)
+        npt.assert_array_equal(density.support, np.arange(5))
+        npt.assert_allclose(density.pmf, 0.25 * stats.binom.pmf(np.arange(5), 4, 0.5))
+
+        # degenerate parameters do not break the preview
+        distr_0.change_distribution("uniform")
+        param_scale = distr_0.get_parameter_by_name("scale")
+        assert param_scale is not None
+        param_scale.change_current(0)
+        density = noise.density_preview()
+        self.assertTrue(np.isfinite(density.pdf).all())
+
 
 class DistributionTest(TestCase):
     def test_simple_distribution(self):
@@ -150,3 +429,93 @@ class DistributionTest(TestCase):
         assert param_p is not None
         self.assertEqual(param_n.current, 1)
         self.assertEqual(param_p.current, 0.5)
+
+    def test_native_samplers(self):
+        for name in Distribution.parameter_options():
+            distribution = Distribution.get_distribution("0", name)
+            assert distribution is not None
+            if name == "binom":
+                param_n = distribution.get_parameter_by_name("n")
+                assert param_n is not None
+                param_n.change_current(6)
+
+            native = distribution.sample(np.random.default_rng(0), 20_000)
+            fallback = distribution.sample(
+                np.random.default_rng(0), 20_000, native=False
+            )
+            self.assertEqual(native.shape, (20_000,))
+            # same distribution as the scipy reference
+            self.assertAlmostEqual(native.mean(), fallback.mean(), delta=0.05)
+            self.assertAlmostEqual(native.std(), fallback.std(), delta=0.05)
+            self.assertAlmostEqual(native.min(), fallback.min(), delta=0.5)
+            if name in ["poisson", "binom", "bernoulli", "randint"]:
+                self.assertSetEqual(
+                    set(np.unique(native)).difference(np.unique(fallback)), set()
+                )
+
+    def test_empirical_distribution(self):
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as directory:
+            # custom pmf with many support points
+            support = np.arange(5000) * 0.5
+            weights = rng.random(5000) ** 4
+            pmf_path = os.path.join(directory, "pmf.npy")
+            np.save(pmf_path, np.column_stack([support, weights]))
+            samples_path = os.path.join(directory, "samples.npy")
+            np.save(samples_path, np.array([1.0, 2.0, 2.0, 7.5]))
+
+            table = load_empirical_table(pmf_path)
+            self.assertIs(load_empirical_table(pmf_path), table)
+            self.assertIsInstance(table.values, np.memmap)
+            assert table.acceptance is not None and table.alias is not None
+            # the alias table reproduces the pmf exactly
+            probabilities = table.acceptance.copy()
+            np.add.at(probabilities, table.alias, 1.0 - table.acceptance)
+            npt.assert_allclose(probabilities / 5000, weights / weights.sum())
+
+            draws = table.rvs(size=200_000, random_state=rng)
+            frequencies = np.bincount((draws * 2).astype(int), minlength=5000)
+            expected = weights / weights.sum() * 200_000
+            self.assertLess(
+                np.abs(frequencies - expected).max(), 5 * np.sqrt(expected.max())
+            )
+            npt.assert_allclose(table.pmf(support), weights / weights.sum())
+            self.assertEqual(table.pmf([0.25])[0], 0.0)
+
+            distribution = Distribution.get_distribution("0", "normal")
+            assert distribution is not None
+            distribution.change_distribution("empirical", source=samples_path)
+            self.assertEqual(distribution.name, "empirical")
+            self.assertListEqual(distribution.get_parameter_names(), [])
+            values = distribution.sample(rng, 10_000)
+            self.assertSetEqual(set(values), {1.0, 2.0, 7.5})
+            self.assertAlmostEqual(np.mean(values == 2.0), 0.5, delta=0.02)
+            self.assertIs(deepcopy(distribution).generator, distribution.generator)
+
+            noise = Noise.default_noise("a")
+            distr_0 = noise.get_distribution_by_id("0")
+            assert distr_0 is not None
+            distr_0.change_distribution("empirical", source=pmf_path)
+            values = noise.generate_data(nr_points=1000)
+            self.assertTrue(np.isin(values, support).all())
+            # inverse cdf for common random numbers and quasi random sampling
+            values = noise.generate_data(sampling="lhs", nr_points=1000)
+            self.assertTrue(np.isin(values, support).all())
+            density = noise.density_preview()
+            self.assertAlmostEqual(density.pmf.sum(), 1.0, delta=0.01)
+
+            # a changed source file is sampled again, not served from the cache
+            cache = SampleCache()
+            distr_0.change_distribution("empirical", source=samples_path)
+            self.assertTrue(np.isin(cache.get(noise), [1.0, 2.0, 7.5]).all())
+            modified = os.stat(samples_path).st_mtime_ns
+            np.save(samples_path, np.array([3.0, 4.0]))
+            os.utime(samples_path, ns=(modified + 10**9, modified + 10**9))
+            self.assertTrue(np.isin(cache.get(noise), [3.0, 4.0]).all())
+            self.assertEqual(cache.misses, 2)
+
+            with self.assertRaises(Exception):
+                Distribution.empirical("0", os.path.join(directory, "missing.npy"))
+            np.save(pmf_path, np.zeros((3, 3)))
+            with self.assertRaises(Exception):
+                EmpiricalTable(pmf_path)